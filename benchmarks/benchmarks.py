@@ -0,0 +1,228 @@
+"""
+asv benchmarks of the sampling and enumeration hot paths.
+
+time_* benchmarks are timed by asv; track_* benchmarks report the cost per unit of work (seconds per flip or
+per state), so that a slowdown shows up as an increase, which asv flags as a regression, whatever the size
+of the benchmarked system.
+"""
+import copy
+import random
+import time
+
+import numpy as np
+
+import monte_carlo
+
+
+def random_hamiltonian(N, degree, seed=0):
+    """
+    Builds a Hamiltonian with N spins and, on average, degree neighbors per spin, on a ring plus random bonds.
+    """
+    rng = np.random.default_rng(seed)
+    ring = np.arange(N)
+    i = np.concatenate((ring, rng.integers(N, size=N * (degree - 2) // 2)))
+    j = np.concatenate(((ring + 1) % N, rng.integers(N, size=N * (degree - 2) // 2)))
+    keep = i != j
+    edges = np.column_stack((i[keep], j[keep], rng.normal(size=keep.sum())))
+    return monte_carlo.IsingHamiltonian.from_edge_list(edges, mu=rng.normal(scale=.1, size=N))
+
+
+def random_conf(N, seed=0):
+    """
+    Returns a random BitString of length N.
+    """
+    conf = monte_carlo.BitString(N=N)
+    conf.initialize(M=N // 2, rng=seed)
+    return conf
+
+
+def seconds_per_item(function, count, min_seconds=0.2):
+    """
+    Calls function, which handles count items per call, until min_seconds have passed and returns the seconds
+    per item.
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return elapsed / (count * calls)
+
+
+class Energy:
+    """
+    Full energies, batched energies of 256 configurations and single-flip energy changes across system size
+    and graph density.
+    """
+    params = ([64, 1024, 16384], [2, 8, 32])
+    param_names = ["N", "degree"]
+
+    def setup(self, N, degree):
+        self.ham = random_hamiltonian(N, degree)
+        self.conf = random_conf(N)
+        self.configs = np.random.default_rng(0).integers(0, 2, size=(256, N), dtype=np.uint8)
+
+    def time_energy(self, N, degree):
+        self.ham.energy(self.conf)
+
+    def time_energy_batch(self, N, degree):
+        self.ham.energy_batch(self.configs)
+
+    def time_delta_e_for_flip(self, N, degree):
+        self.ham.delta_e_for_flip(N // 2, self.conf.config)
+
+
+class MetropolisSweep:
+    """
+    One Metropolis sweep per move type, across system size, density and temperature.
+    """
+    params = ([64, 1024, 16384], [2, 8], [1.0, 4.0], ["sequential", "numba", "checkerboard"])
+    param_names = ["N", "degree", "T", "method"]
+    timeout = 300
+
+    def setup(self, N, degree, T, method):
+        if method == "numba" and not monte_carlo.kernels._numba_available():
+            raise NotImplementedError("Numba is not installed")
+        if method == "sequential" and N > 1024:
+            raise NotImplementedError("too slow to be worth timing")
+        self.ham = random_hamiltonian(N, degree)
+        self.conf = random_conf(N)
+        self.rng = np.random.default_rng(0)
+        # compile and cache the kernel and the coloring outside of the timing
+        self.ham.metropolis_sweep(copy.deepcopy(self.conf), T, method, self.rng)
+
+    def time_sweep(self, N, degree, T, method):
+        self.ham.metropolis_sweep(self.conf, T, method, self.rng)
+
+    def track_seconds_per_flip(self, N, degree, T, method):
+        return seconds_per_item(lambda: self.ham.metropolis_sweep(self.conf, T, method, self.rng), N)
+    track_seconds_per_flip.unit = "seconds/flip"
+
+
+class DenseSweep:
+    """
+    Sequential sweeps of an all-to-all ferromagnet, with and without tracked local fields.
+    """
+    params = ([64, 256], [1.0, 100.0], [False, True])
+    param_names = ["N", "T", "local_fields"]
+
+    def setup(self, N, T, local_fields):
+        i, j = np.triu_indices(N, 1)
+        edges = np.column_stack((i, j, -np.ones(len(i))))
+        self.ham = monte_carlo.IsingHamiltonian.from_edge_list(edges, mu=np.zeros(N))
+        self.conf = random_conf(N)
+        self.rng = np.random.default_rng(0)
+        self.state = monte_carlo.SamplerState(self.ham, self.conf, local_fields=local_fields)
+
+    def track_seconds_per_flip(self, N, T, local_fields):
+        sweep = lambda: self.ham.metropolis_sweep(self.conf, T, "sequential", self.rng, self.state)
+        return seconds_per_item(sweep, N)
+    track_seconds_per_flip.unit = "seconds/flip"
+
+
+class AcceptanceTable:
+    """
+    Sequential sweeps of a ring with integer couplings, with the acceptance probabilities looked up in the
+    per-temperature table or evaluated with the exponential; the table has to be the faster of the two.
+    """
+    params = ([1.0, 4.0], [False, True], ["table", "exp"])
+    param_names = ["T", "local_fields", "acceptance"]
+
+    def setup(self, T, local_fields, acceptance):
+        N = 2000
+        edges = np.column_stack((np.arange(N), (np.arange(N) + 1) % N, np.ones(N)))
+        self.ham = monte_carlo.IsingHamiltonian.from_edge_list(edges, mu=np.zeros(N))
+        if acceptance == "exp":
+            self.ham.acceptance_table = lambda T: None
+        self.conf = random_conf(N)
+        self.rng = np.random.default_rng(0)
+        self.state = monte_carlo.SamplerState(self.ham, self.conf, local_fields=local_fields)
+
+    def track_seconds_per_flip(self, T, local_fields, acceptance):
+        sweep = lambda: self.ham.metropolis_sweep(self.conf, T, "sequential", self.rng, self.state)
+        return seconds_per_item(sweep, self.conf.N, min_seconds=1.0)
+    track_seconds_per_flip.unit = "seconds/flip"
+
+
+class SpinGlass:
+    """
+    A Sherrington-Kirkpatrick spin glass in sparse and dense storage: sweeps and batched energies.
+    """
+    params = ([256, 1024], ["sparse", "dense"])
+    param_names = ["N", "storage"]
+    timeout = 300
+
+    def setup(self, N, storage):
+        rng = np.random.default_rng(0)
+        i, j = np.triu_indices(N, 1)
+        edges = np.column_stack((i, j, rng.normal(scale=1 / np.sqrt(N), size=len(i))))
+        if storage == "dense":
+            self.ham = monte_carlo.DenseIsingHamiltonian.from_edge_list(edges, mu=np.zeros(N))
+        else:
+            self.ham = monte_carlo.IsingHamiltonian.from_edge_list(edges, mu=np.zeros(N))
+        self.conf = random_conf(N)
+        self.spins = 2.0 * rng.integers(0, 2, size=(64, N)) - 1.0
+        self.rng = np.random.default_rng(0)
+
+    def time_batch_energies(self, N, storage):
+        self.ham._spin_energies(self.spins)
+
+    def track_seconds_per_flip(self, N, storage):
+        return seconds_per_item(lambda: self.ham.metropolis_sweep(self.conf, 0.5, "sequential", self.rng), N)
+    track_seconds_per_flip.unit = "seconds/flip"
+
+
+class LatticeSweep:
+    """
+    Checkerboard sweeps of a square lattice, whose neighbors are computed from the stencil.
+    """
+    params = [32, 256]
+    param_names = ["L"]
+
+    def setup(self, L):
+        self.ham = monte_carlo.hypercubic_lattice((L, L), J=-1.0)
+        self.conf = random_conf(L * L)
+        self.rng = np.random.default_rng(0)
+
+    def track_seconds_per_flip(self, L):
+        return seconds_per_item(lambda: self.ham.metropolis_sweep(self.conf, 2.3, "checkerboard", self.rng), L * L)
+    track_seconds_per_flip.unit = "seconds/flip"
+
+
+class Enumeration:
+    """
+    Exact averages by enumerating all 2^N states.
+    """
+    params = ([12, 16, 20], ["chunked", "gray"])
+    param_names = ["N", "method"]
+    timeout = 300
+
+    def setup(self, N, method):
+        self.ham = random_hamiltonian(N, 4)
+        self.conf = monte_carlo.BitString(N=N)
+
+    def time_compute_average_values(self, N, method):
+        self.ham.compute_average_values(self.conf, 2.0, method=method)
+
+    def track_seconds_per_state(self, N, method):
+        return seconds_per_item(lambda: self.ham.compute_average_values(self.conf, 2.0, method=method), 2 ** N)
+    track_seconds_per_state.unit = "seconds/state"
+
+
+class MonteCarlo:
+    """
+    A short metropolis_monte_carlo run, including thermalization and the incremental measurements.
+    """
+    params = ([16, 256], [1.0, 4.0], ["sequential", "checkerboard", "wolff"])
+    param_names = ["N", "T", "method"]
+
+    def setup(self, N, T, method):
+        self.ham = random_hamiltonian(N, 4)
+        self.conf = random_conf(N)
+
+    def time_metropolis_monte_carlo(self, N, T, method):
+        random.seed(0)
+        monte_carlo.metropolis_monte_carlo(self.ham, copy.deepcopy(self.conf), T=T, nsweep=100, nburn=10,
+                                           method=method, rng=0)
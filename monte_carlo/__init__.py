@@ -4,4 +4,16 @@
 from .metropolis_monte_carlo import *
 from .bitstring import *
 from .ising_hamiltonian import *
+from .sampler_state import *
+from .accumulators import *
+from .checkpoint import *
+from .random_streams import *
+from .lattices import *
+from .dense import *
+from .enumeration import *
+from .parallel_tempering import *
+from .cluster import *
+from .analysis import *
+from .scan import *
+from .shared import *
 
@@ -0,0 +1,76 @@
+import numpy as np
+import collections
+
+from .enumeration import _states_to_spins
+
+# couplings whose sites have more neighbors, or with more distinct energy changes, are treated as continuous
+MAX_TABLE_DEGREE = 12
+MAX_TABLE_VALUES = 1024
+# the number of temperatures whose acceptance tables are kept, e.g. during a temperature scan
+ACCEPTANCE_CACHE_SIZE = 64
+# an energy change dE is looked up under the integer round(dE * TABLE_SCALE), so that changes summed in another
+# order than the table's still find their entry; rounding a Python float is far cheaper than the exponential
+TABLE_SCALE = 2.0**30
+
+
+def _delta_e_values(ham, max_degree=MAX_TABLE_DEGREE, max_values=MAX_TABLE_VALUES):
+    """
+    Returns the sorted distinct energy changes of single spin flips, one per key round(dE * TABLE_SCALE), or None
+    if there are too many to tabulate.
+
+    Sites with the same field and the same multiset of couplings, given by ham._site_couplings, form a class; for
+    each class every sign pattern of the neighbors gives dE = +-2 (sum_j J_ij s_j + mu_i).
+    """
+    couplings = ham._site_couplings(max_degree)
+    if couplings is None:
+        return None
+    degree, js = couplings
+    classes = np.unique(np.column_stack((np.broadcast_to(ham.mu, (ham.N,)), degree, js)), axis=0)
+
+    values = {}
+    for row in classes:
+        mu, d, js = row[0], int(row[1]), row[2:2 + int(row[1])]
+        fields = (_states_to_spins(np.arange(2**d, dtype=np.int64), d) @ js + mu).tolist()
+        for delta_e in [2.0 * field for field in fields] + [-2.0 * field for field in fields]:
+            values.setdefault(round(delta_e * TABLE_SCALE), delta_e)
+        if len(values) > max_values:
+            return None
+    return np.array(sorted(values.values()))
+
+
+def _csr_site_couplings(indptr, data, max_degree):
+    """
+    Returns the degree of every site and its sorted couplings, zero-padded to the largest degree, from CSR arrays,
+    or None if a site has more than max_degree neighbors.
+    """
+    N = len(indptr) - 1
+    degree = np.diff(indptr)
+    if N == 0 or degree.max() > max_degree:
+        return None
+    js = np.zeros((N, degree.max()))
+    starts = indptr[:-1]
+    for d in np.unique(degree[degree > 0]):
+        sites = np.flatnonzero(degree == d)
+        js[sites, :d] = np.sort(data[starts[sites, None] + np.arange(d)], axis=1)
+    return degree, js
+
+
+class _LRUCache(collections.OrderedDict):
+    """
+    An OrderedDict that keeps only the maxsize most recently used entries.
+    """
+    def __init__(self, maxsize=64):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def lookup(self, key, build):
+        """
+        Returns the entry for key, building (and possibly evicting the least recently used entry) on a miss.
+        """
+        if key in self:
+            self.move_to_end(key)
+            return self[key]
+        value = self[key] = build()
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+        return value
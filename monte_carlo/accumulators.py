@@ -0,0 +1,190 @@
+import numpy as np
+
+
+class WelfordAccumulator:
+    """
+    Running mean and variance of E and M with Welford's algorithm, in O(1) memory.
+
+    Attributes:
+    - n (int): The number of samples added.
+    - mean (numpy.ndarray): The running means of (E, M).
+    - m2 (numpy.ndarray): The running sums of squared deviations of (E, M) from their means.
+
+    Methods:
+    - add(self, E, M): Adds one sample.
+    - variance(self): Returns the population variances of (E, M).
+    - averages(self, T): Returns the average energy, magnetization, heat capacity and susceptibility.
+    """
+    def __init__(self):
+        """
+        Constructs an empty accumulator.
+        """
+        self.n = 0
+        self.mean = np.zeros(2)
+        self.m2 = np.zeros(2)
+
+    def add(self, E, M):
+        """
+        Adds the energy E and magnetization M of one sample.
+        """
+        self.n += 1
+        x = np.array((E, M), dtype=float)
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    def variance(self):
+        """
+        Returns the population variances <x^2> - <x>^2 of (E, M).
+        """
+        return self.m2 / self.n
+
+    def averages(self, T):
+        """
+        Returns the average energy, magnetization, heat capacity and magnetic susceptibility at temperature T.
+        """
+        var_e, var_m = self.variance()
+        return self.mean[0], self.mean[1], var_e / T / T, var_m / T
+
+
+class HistogramAccumulator:
+    """
+    A fixed-bin histogram of E or M.
+
+    Attributes:
+    - edges (numpy.ndarray): The bin edges.
+    - counts (numpy.ndarray): The number of samples in each bin.
+    - underflow (int): The number of samples below the first edge.
+    - overflow (int): The number of samples at or above the last edge.
+
+    Methods:
+    - add(self, E, M): Adds one sample.
+    """
+    def __init__(self, bins, range, observable="E"):
+        """
+        Constructs an empty histogram.
+
+        Parameters
+        ----------
+        bins : int
+            The number of equal-width bins.
+        range : tuple of float
+            The lower and upper edges of the histogram.
+        observable : str, optional
+            "E" or "M" (default is "E").
+        """
+        if observable not in ("E", "M"):
+            raise ValueError(f"Unknown observable {observable!r}, expected 'E' or 'M'.")
+        self.observable = observable
+        self.edges = np.linspace(range[0], range[1], bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+        self._scale = bins / (range[1] - range[0])
+
+    def add(self, E, M):
+        """
+        Adds the energy E and magnetization M of one sample.
+        """
+        x = E if self.observable == "E" else M
+        b = int(np.floor((x - self.edges[0]) * self._scale))
+        if b < 0:
+            self.underflow += 1
+        elif b >= len(self.counts):
+            self.overflow += 1
+        else:
+            self.counts[b] += 1
+
+
+class BinningAccumulator:
+    """
+    Binning error analysis: the samples are averaged over consecutive bins of bin_size, and the standard
+    error of the mean is estimated from the scatter of the bin averages.
+
+    Once the bins are longer than the autocorrelation time the bin averages are independent and the
+    error is reliable. Memory is O(1): only the current bin and a Welford accumulator of the bin averages
+    are kept.
+
+    Attributes:
+    - bin_size (int): The number of samples per bin.
+    - bins (WelfordAccumulator): The statistics of the completed bin averages of (E, M).
+
+    Methods:
+    - add(self, E, M): Adds one sample.
+    - standard_error(self): Returns the standard errors of the means of (E, M).
+    """
+    def __init__(self, bin_size=100):
+        """
+        Constructs an empty binning accumulator.
+
+        Parameters
+        ----------
+        bin_size : int, optional
+            The number of samples per bin (default is 100).
+        """
+        self.bin_size = bin_size
+        self.bins = WelfordAccumulator()
+        self._sum = np.zeros(2)
+        self._count = 0
+
+    def add(self, E, M):
+        """
+        Adds the energy E and magnetization M of one sample.
+        """
+        self._sum += (E, M)
+        self._count += 1
+        if self._count == self.bin_size:
+            self.bins.add(*(self._sum / self.bin_size))
+            self._sum[:] = 0.0
+            self._count = 0
+
+    def standard_error(self):
+        """
+        Returns the standard errors of the means of (E, M), or NaN with fewer than two completed bins.
+        """
+        if self.bins.n < 2:
+            return np.full(2, np.nan)
+        return np.sqrt(self.bins.m2 / (self.bins.n - 1) / self.bins.n)
+
+
+class TraceAccumulator:
+    """
+    Records the full E and M traces. Memory grows with the number of samples, so this is opt-in.
+
+    Attributes:
+    - E (numpy.ndarray): The recorded energies.
+    - M (numpy.ndarray): The recorded magnetizations.
+
+    Methods:
+    - add(self, E, M): Adds one sample.
+    """
+    def __init__(self):
+        """
+        Constructs an empty trace.
+        """
+        self._buffer = np.zeros((1024, 2))
+        self._count = 0
+
+    def add(self, E, M):
+        """
+        Adds the energy E and magnetization M of one sample.
+        """
+        if self._count == len(self._buffer):
+            # grow geometrically, so recording costs amortized O(1) per sample
+            self._buffer = np.concatenate((self._buffer, np.zeros_like(self._buffer)))
+        self._buffer[self._count] = (E, M)
+        self._count += 1
+
+    @property
+    def E(self):
+        """
+        The recorded energies.
+        """
+        return self._buffer[:self._count, 0]
+
+    @property
+    def M(self):
+        """
+        The recorded magnetizations.
+        """
+        return self._buffer[:self._count, 1]
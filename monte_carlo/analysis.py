@@ -0,0 +1,334 @@
+import numpy as np
+import copy
+import time
+
+from .metropolis_monte_carlo import metropolis_samples
+
+
+def autocorrelation(x):
+    """
+    Computes the normalized autocorrelation function of a time series with an FFT.
+
+    Parameters
+    ----------
+    x : array_like
+        The time series.
+
+    Returns
+    -------
+    numpy.ndarray
+        rho(t) for t = 0 .. len(x)-1, with rho(0) = 1.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    dx = x - x.mean()
+    size = 1 << (2 * n - 1).bit_length()
+    f = np.fft.rfft(dx, size)
+    acf = np.fft.irfft(f * np.conj(f), size)[:n]
+    if acf[0] == 0.0:
+        # a constant series has no fluctuations to correlate
+        return np.concatenate(([1.0], np.zeros(n - 1)))
+    return acf / acf[0]
+
+
+def integrated_autocorrelation_time(x, c=5.0):
+    """
+    Estimates the integrated autocorrelation time tau = 1/2 + sum_t rho(t) of a time series.
+
+    The sum is truncated with Sokal's automatic window, at the smallest W with W >= c * tau(W).
+
+    Parameters
+    ----------
+    x : array_like
+        The time series.
+    c : float, optional
+        The window constant (default is 5.0).
+
+    Returns
+    -------
+    float
+        The integrated autocorrelation time in units of the sampling interval.
+    """
+    rho = autocorrelation(x)
+    taus = np.cumsum(rho) - 0.5
+    window = np.arange(len(taus)) >= c * taus
+    W = np.argmax(window) if window.any() else len(taus) - 1
+    return float(taus[W])
+
+
+def compare_autocorrelation_times(ham, conf, T, methods=("sequential", "wolff", "swendsen-wang"), nsweep=2000,
+                                  nburn=200, rng=None):
+    """
+    Compares the integrated autocorrelation times of E and |M| between move types.
+
+    Every method starts from a copy of conf and runs through the same sampling loop as
+    metropolis_monte_carlo, so the times are in units of that method's sweep. The absolute magnetization is
+    used because cluster moves flip the sign of M freely, which says nothing about how fast |M| decorrelates.
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian to sample.
+    conf : BitString
+        The initial configuration, left unchanged.
+    T : float
+        The temperature.
+    methods : sequence of str, optional
+        The move types to compare (default is Metropolis, Wolff and Swendsen-Wang).
+    nsweep : int, optional
+        The number of measured sweeps per method (default is 2000).
+    nburn : int, optional
+        The number of thermalization sweeps per method (default is 200).
+    rng : numpy.random.Generator or int, optional
+        The generator (or seed) for the numpy-based move types.
+
+    Returns
+    -------
+    dict
+        For each method, a dict with the autocorrelation times "tau_E" and "tau_absM" and the wall-clock
+        "seconds_per_sweep", so that tau * seconds_per_sweep compares the cost of an independent sample.
+    """
+    comparison = {}
+    for method in methods:
+        start = time.perf_counter()
+        samples = np.array(list(metropolis_samples(ham, copy.deepcopy(conf), T, nsweep, nburn, method, rng)))
+        elapsed = time.perf_counter() - start
+        comparison[method] = {
+            "tau_E": integrated_autocorrelation_time(samples[:, 0]),
+            "tau_absM": integrated_autocorrelation_time(np.abs(samples[:, 1])),
+            "seconds_per_sweep": elapsed / (nsweep + nburn),
+        }
+    return comparison
+
+
+class BlockingAnalysis:
+    """
+    Incremental Flyvbjerg-Petersen blocking analysis of the E and M sample streams.
+
+    Every sample adds x = (E, M, E^2, M^2) to blocking level 0; whenever a level has two pending values
+    their average is passed on to the next level. Each level keeps only running sums (of x, of the outer
+    products x x^T and of the lag-one products x_i x_{i+1}), so memory is O(log n). The level at which the
+    blocked variances reach their plateau is picked with Jonsson's automatic criterion (Phys. Rev. E 98,
+    043304), and the errors of the heat capacity and susceptibility, which are nonlinear in the means,
+    follow from the covariance of x at that level with the delta method.
+
+    Attributes:
+    - n (int): The number of samples added.
+
+    Methods:
+    - add(self, E, M): Adds one sample.
+    - means(self): Returns the means of (E, M, E^2, M^2).
+    - level(self): Returns the blocking level at which the variances have converged, or None.
+    - errors(self, T): Returns the averages of E, M, heat capacity and susceptibility and their errors.
+    - effective_sample_size(self): Returns the effective number of independent samples of (E, M, E^2, M^2).
+    - autocorrelation_times(self): Returns the integrated autocorrelation times of (E, M, E^2, M^2).
+    - converged(self, T, rel_error, observables): Returns whether the relative errors are below rel_error.
+    """
+    _OBSERVABLES = ("E", "M", "HC", "MS")
+
+    def __init__(self):
+        """
+        Constructs an empty analysis.
+        """
+        self.n = 0
+        self._count = []
+        self._sum = []
+        self._outer = []
+        self._lag = []
+        self._first = []
+        self._last = []
+        self._pending = []
+
+    def add(self, E, M):
+        """
+        Adds the energy E and magnetization M of one sample.
+        """
+        self.n += 1
+        x = np.array((E, M, E * E, M * M), dtype=float)
+        k = 0
+        while x is not None:
+            if k == len(self._count):
+                self._count.append(0)
+                self._sum.append(np.zeros(4))
+                self._outer.append(np.zeros((4, 4)))
+                self._lag.append(np.zeros(4))
+                self._first.append(x)
+                self._last.append(None)
+                self._pending.append(None)
+            if self._last[k] is not None:
+                self._lag[k] += self._last[k] * x
+            self._count[k] += 1
+            self._sum[k] += x
+            self._outer[k] += np.outer(x, x)
+            self._last[k] = x
+            if self._pending[k] is None:
+                self._pending[k], x = x, None
+            else:
+                self._pending[k], x = None, 0.5 * (self._pending[k] + x)
+            k += 1
+
+    def means(self):
+        """
+        Returns the means of (E, M, E^2, M^2).
+        """
+        return self._sum[0] / self.n
+
+    def _covariance(self, k):
+        """
+        Returns the population covariance of x and the diagonal lag-one autocovariance at level k.
+        """
+        n = self._count[k]
+        mean = self._sum[k] / n
+        cov = self._outer[k] / n - np.outer(mean, mean)
+        lag = (self._lag[k] - mean * (2 * self._sum[k] - self._first[k] - self._last[k])) / n + (n - 1) / n * mean**2
+        return cov, lag
+
+    def level(self):
+        """
+        Returns the smallest blocking level at which the blocked samples are uncorrelated for all of
+        (E, M, E^2, M^2), following Jonsson's test at the 1% level, or None if no level passes yet.
+        """
+        levels = [k for k in range(len(self._count)) if self._count[k] >= 2]
+        stats = []
+        for k in levels:
+            cov, lag = self._covariance(k)
+            var = np.diag(cov)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                m = self._count[k] * ((self._count[k] - 1) * var / self._count[k]**2 + lag)**2 / var**2
+            # a component without fluctuations is trivially uncorrelated
+            stats.append(np.where(var > 0, m, 0.0))
+        tails = np.cumsum(stats[::-1], axis=0)[::-1] if stats else []
+        z = 2.3263478740408408
+        for j, tail in enumerate(tails):
+            dof = len(levels) - j
+            # Wilson-Hilferty approximation of the 99% chi-squared quantile
+            quantile = dof * (1 - 2 / (9 * dof) + z * np.sqrt(2 / (9 * dof)))**3
+            if np.all(tail < quantile):
+                return levels[j]
+        return None
+
+    def _mean_covariance(self):
+        """
+        Returns the covariance matrix of the means of x, from the converged level (or the highest one).
+        """
+        k = self.level()
+        if k is None:
+            k = max((k for k in range(len(self._count)) if self._count[k] >= 2), default=0)
+        if self._count[k] < 2:
+            return np.full((4, 4), np.inf)
+        return self._covariance(k)[0] / (self._count[k] - 1)
+
+    def errors(self, T):
+        """
+        Returns the averages of E, M, heat capacity and magnetic susceptibility at temperature T, and their
+        standard errors.
+
+        Parameters
+        ----------
+        T : float
+            The temperature.
+
+        Returns
+        -------
+        tuple of dict
+            The averages and the errors, keyed by "E", "M", "HC" and "MS".
+        """
+        E, M, EE, MM = self.means()
+        gradients = {
+            "E": np.array((1.0, 0.0, 0.0, 0.0)),
+            "M": np.array((0.0, 1.0, 0.0, 0.0)),
+            "HC": np.array((-2 * E, 0.0, 1.0, 0.0)) / T / T,
+            "MS": np.array((0.0, -2 * M, 0.0, 1.0)) / T,
+        }
+        averages = {"E": E, "M": M, "HC": (EE - E * E) / T / T, "MS": (MM - M * M) / T}
+        cov = self._mean_covariance()
+        with np.errstate(invalid="ignore"):
+            errors = {name: float(np.sqrt(max(g @ cov @ g, 0.0))) for name, g in gradients.items()}
+        return averages, errors
+
+    def effective_sample_size(self):
+        """
+        Returns the effective number of independent samples of (E, M, E^2, M^2), n var(x) / (n var(mean)).
+        """
+        var = np.diag(self._covariance(0)[0]) * self.n / (self.n - 1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(var > 0, var / np.diag(self._mean_covariance()), float(self.n))
+
+    def autocorrelation_times(self):
+        """
+        Returns the integrated autocorrelation times of (E, M, E^2, M^2), n / (2 ESS).
+        """
+        return self.n / (2 * self.effective_sample_size())
+
+    def converged(self, T, rel_error, observables=("E", "HC", "MS")):
+        """
+        Returns whether the blocking level has converged and every requested observable has a relative
+        standard error below rel_error.
+
+        Parameters
+        ----------
+        T : float
+            The temperature.
+        rel_error : float
+            The target relative error.
+        observables : sequence of str, optional
+            Any of "E", "M", "HC" and "MS" (default is E, heat capacity and susceptibility).
+        """
+        if self.level() is None:
+            return False
+        averages, errors = self.errors(T)
+        return all(errors[name] <= rel_error * abs(averages[name]) for name in observables)
+
+
+def sample_until_converged(ham, conf, T, rel_error=0.01, observables=("E", "HC", "MS"), max_sweeps=10**6,
+                           nburn=100, check_interval=1000, accumulators=None, method="sequential", rng=None,
+                           refresh_interval=1000):
+    """
+    Samples until the blocking errors of the requested observables reach a target relative error.
+
+    Every check_interval sweeps the blocking analysis is asked whether it has converged, so sampling stops
+    at most check_interval sweeps after the target is reached, and after max_sweeps in any case.
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian to sample.
+    conf : BitString
+        The initial configuration, updated in place.
+    T : float
+        The temperature.
+    rel_error : float, optional
+        The target relative standard error (default is 0.01).
+    observables : sequence of str, optional
+        Any of "E", "M", "HC" and "MS" (default is E, heat capacity and susceptibility).
+    max_sweeps : int, optional
+        The largest number of measured sweeps (default is 10**6).
+    nburn : int, optional
+        The number of thermalization sweeps (default is 100).
+    check_interval : int, optional
+        The number of sweeps between convergence checks (default is 1000).
+    accumulators : list, optional
+        Further accumulators fed with the same samples, as in stream_monte_carlo.
+    method : str, optional
+        The move type, as in metropolis_monte_carlo (default is "sequential").
+    rng : numpy.random.Generator or int, optional
+        The generator (or seed) for the numpy-based move types.
+    refresh_interval : int, optional
+        The number of sweeps between full recomputations of the tracked E and M (default is 1000).
+
+    Returns
+    -------
+    BlockingAnalysis
+        The analysis of the samples; its n is the number of sweeps that were measured.
+    """
+    unknown = set(observables) - set(BlockingAnalysis._OBSERVABLES)
+    if unknown:
+        raise ValueError(f"Unknown observables {sorted(unknown)}, expected some of {BlockingAnalysis._OBSERVABLES}.")
+    analysis = BlockingAnalysis()
+    accumulators = [analysis] + list(accumulators or [])
+    for Ei, Mi in metropolis_samples(ham, conf, T, max_sweeps, nburn, method, rng, refresh_interval):
+        for accumulator in accumulators:
+            accumulator.add(Ei, Mi)
+        if analysis.n % check_interval == 0 and analysis.converged(T, rel_error, observables):
+            break
+    return analysis
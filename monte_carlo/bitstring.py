@@ -1,6 +1,8 @@
 import numpy as np
 import random
 
+from .random_streams import _as_generator
+
 class BitString:
     """
     A class representing a binary string of length N.
@@ -9,18 +11,22 @@ class BitString:
     - N (int): The length of the bitstring.
     - pbc (bool): Whether the bitstring should be treated as a periodic boundary condition.
     - n_dim (int): The total number of possible bitstrings of length N.
-    - config (numpy.ndarray): The binary array representing the current state of the bitstring.
+    - config (numpy.ndarray): The binary int8 array (one byte per spin) representing the current state of the bitstring.
 
     Methods:
     - __init__(self, N=10, pbc=True): Initializes a new BitString object.
     - __repr__(self): Returns a string representation of the BitString object.
     - __str__(self): Returns a string representation of the binary configuration of the bitstring.
     - __getitem__(self, i): Returns the binary value at index i in the bitstring.
-    - initialize(self, M=0): Randomly initializes the bitstring with M non-zero values.
+    - initialize(self, M=0, rng=None): Randomly initializes the bitstring with M non-zero values.
     - flip_site(self, i): Flips the binary value at index i in the bitstring.
     - set_int_config(self, int_index): Sets the configuration of the bitstring to the binary representation of int_index.
+    - get_int_config(self): Returns the integer whose binary representation is the bitstring.
     - get_magnetization(self): Calculates and returns the magnetization of the bitstring.
-    - set_config(self, conf): Sets the configuration of the bitstring to conf.
+    - set_config(self, conf, copy=True): Sets the configuration of the bitstring to conf.
+    - view(self, dtype=np.int8): Returns a zero-copy view of the configuration.
+    - packed(self): Returns the configuration packed eight spins per byte.
+    - from_packed(packed, N): Constructs a BitString from a packed configuration.
     """
     def __init__(self, N=10, pbc=True):
         """
@@ -36,7 +42,7 @@ class BitString:
         self.N = N
         self.pbc = pbc
         self.n_dim = 2 ** self.N
-        self.config = np.zeros(N, dtype=int)
+        self.config = np.zeros(N, dtype=np.int8)
 
     def __repr__(self):
         """
@@ -62,11 +68,14 @@ class BitString:
         Returns
         -------
         int
-            The value of the i-th element (0 or 1).
+            The value of the i-th element (0 or 1). An array of indices returns an int8 array.
         """
+        if np.ndim(i) == 0 and not isinstance(i, slice):
+            # a Python int, like the elements of the original integer configuration
+            return int(self.config[i])
         return self.config[i]
 
-    def initialize(self, M=0):
+    def initialize(self, M=0, rng=None):
         """
         Initializes the binary string with M randomly chosen 1s.
 
@@ -74,11 +83,15 @@ class BitString:
         ----------
         M : int, optional
             The number of 1s to initialize the binary string with (default is 0).
+        rng : numpy.random.Generator, numpy.random.SeedSequence or int, optional
+            The generator (or seed) the sites are chosen with. By default they are drawn from the random module.
         """
-        self.config = np.zeros(self.N, dtype=int)
-        random_indices = random.sample(range(0, self.N), M)
-        for i in random_indices:
-            self.config[i] = 1
+        self.config = np.zeros(self.N, dtype=np.int8)
+        if rng is None:
+            random_indices = random.sample(range(0, self.N), M)
+        else:
+            random_indices = _as_generator(rng).choice(self.N, size=M, replace=False)
+        self.config[random_indices] = 1
 
     def flip_site(self, i):
         """
@@ -95,27 +108,89 @@ class BitString:
         """
         Sets the binary string from an integer index.
 
+        The most significant of the N bits of int_index is site 0.
+
         Parameters
         ----------
         int_index : int
             The integer index to set the binary string from.
         """
-        self.config = np.array([int(i) for i in np.binary_repr(int_index, width=self.N)])
+        n_bytes = (self.N + 7) // 8
+        bits = np.unpackbits(np.frombuffer(int(int_index).to_bytes(n_bytes, "big"), dtype=np.uint8))
+        self.config = bits[8 * n_bytes - self.N:].view(np.int8)
+
+    def get_int_config(self):
+        """
+        Returns the integer index of the binary string, the inverse of set_int_config.
+        """
+        padding = np.zeros((-self.N) % 8, dtype=np.int8)
+        return int.from_bytes(np.packbits(np.concatenate((padding, self.config))).tobytes(), "big")
 
     def get_magnetization(self):
         """
         Returns the magnetization of the bit string.
         """
-        return np.sum(2 * self.config - 1)
+        return 2 * np.count_nonzero(self.config) - self.N
 
-    def set_config(self, conf):
+    def set_config(self, conf, copy=True):
         """
         Sets the bit string to a given configuration.
+
+        conf is copied, so the bit string and the caller's array do not change each other. With copy=False an
+        int8 array is used as is, and the bit string then shares memory with it.
         
         Parameters:
         -----------
         conf: list or array
             The configuration to set the bit string to. Must be of length N.
+        copy: bool, optional
+            Whether to copy conf (default is True).
         """
         assert len(conf) == self.N
-        self.config = np.array(conf)
+        if copy:
+            self.config = np.array(conf, dtype=np.int8)
+        else:
+            self.config = np.asarray(conf, dtype=np.int8)
+
+    def view(self, dtype=np.int8):
+        """
+        Returns a zero-copy view of the configuration with a one-byte dtype.
+
+        Parameters
+        ----------
+        dtype : numpy.dtype, optional
+            np.int8, np.uint8 or np.bool_ (default is np.int8).
+
+        Returns
+        -------
+        numpy.ndarray
+            The configuration, sharing memory with the bit string.
+        """
+        return self.config.view(dtype)
+
+    def packed(self):
+        """
+        Returns the configuration packed eight spins per byte, for compact storage of snapshots.
+        """
+        return np.packbits(self.config)
+
+    @classmethod
+    def from_packed(cls, packed, N):
+        """
+        Constructs a BitString from a configuration packed by packed().
+
+        Parameters
+        ----------
+        packed : numpy.ndarray
+            The packed configuration.
+        N : int
+            The length of the binary string.
+
+        Returns
+        -------
+        BitString
+            The unpacked bit string.
+        """
+        conf = cls(N=N)
+        conf.config = np.unpackbits(np.asarray(packed, dtype=np.uint8), count=N).view(np.int8)
+        return conf
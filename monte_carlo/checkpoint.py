@@ -0,0 +1,77 @@
+import numpy as np
+import os
+import tempfile
+
+
+def save_checkpoint(path, **arrays):
+    """
+    Writes arrays to an .npz checkpoint atomically.
+
+    The data is written to a temporary file in the same directory, flushed to disk and then renamed over
+    path, so a run that is killed while checkpointing leaves the previous checkpoint intact.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The checkpoint file.
+    **arrays : array_like
+        The named arrays to store; strings are stored as 0-d unicode arrays.
+    """
+    path = os.fspath(path)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".npz.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+
+def load_checkpoint(path):
+    """
+    Reads a checkpoint written by save_checkpoint.
+
+    Parameters
+    ----------
+    path : str or os.PathLike
+        The checkpoint file.
+
+    Returns
+    -------
+    dict
+        The stored arrays, with 0-d arrays converted to Python scalars.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key].item() if data[key].ndim == 0 else data[key] for key in data.files}
+
+
+def _history_path(path):
+    """
+    Returns the file next to a checkpoint that holds the appended history of a run.
+    """
+    return os.fspath(path) + ".history"
+
+
+def _append_rows(path, rows):
+    """
+    Appends the rows of a float64 array to a raw binary file and flushes them to disk.
+    """
+    with open(path, "ab") as f:
+        np.ascontiguousarray(rows, dtype="<f8").tofile(f)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_rows(path, n_rows, n_cols):
+    """
+    Reads the first n_rows rows of a file written by _append_rows and truncates it after them, dropping rows
+    that were appended after the last checkpoint was written.
+    """
+    data = np.fromfile(path, dtype="<f8", count=n_rows * n_cols)
+    if len(data) < n_rows * n_cols:
+        raise ValueError(f"{path} holds fewer than the {n_rows} rows recorded in the checkpoint.")
+    os.truncate(path, n_rows * n_cols * 8)
+    return data.reshape(n_rows, n_cols)
@@ -0,0 +1,150 @@
+import numpy as np
+
+from .random_streams import _sweep_generator
+from .ising_hamiltonian import _csr_matvec, _csr_rows
+
+
+def wolff_sweep(ham, conf, T=1.0, rng=None, n_clusters=1, state=None):
+    """
+    Executes n_clusters Wolff single-cluster updates.
+
+    A cluster grows from a random site through the satisfied bonds (J_ij s_i s_j < 0), each added with
+    probability 1 - exp(-2|J_ij|/T). The whole cluster is then flipped with probability
+    min(1, exp(-dE_mu/T)), where dE_mu = -2 sum_{i in cluster} mu_i s_i is the change of the field energy.
+
+    The number of clusters is fixed in advance: stopping once a given number of spins has been touched
+    would make the stopping time depend on the state and bias the sampled distribution.
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian, whose CSR couplings are used.
+    conf : BitString
+        The spin configuration, updated in place.
+    T : float, optional
+        The temperature (default is 1.0).
+    rng : numpy.random.Generator, optional
+        The generator; seeds are rejected, since a seed would replay the same numbers every sweep. By default
+        a generator is seeded from the random module.
+    n_clusters : int, optional
+        The number of clusters built and flipped (default is 1).
+    state : SamplerState, optional
+        If given, the energy and magnetization changes of the flipped clusters are added to it.
+
+    Returns
+    -------
+    BitString
+        The updated configuration.
+    """
+    rng = _sweep_generator(rng)
+    mu = np.broadcast_to(ham.mu, (ham.N,))
+    for _ in range(n_clusters):
+        spins = 2.0 * conf.config - 1.0
+        seed = rng.integers(ham.N)
+        in_cluster = np.zeros(ham.N, dtype=bool)
+        in_cluster[seed] = True
+        stack = [seed]
+        while stack:
+            i = stack.pop()
+            lo, hi = ham.indptr[i], ham.indptr[i + 1]
+            nodes = ham.indices[lo:hi]
+            js = ham.data[lo:hi]
+            satisfied = js * spins[i] * spins[nodes] < 0.0
+            p_add = -np.expm1(-2.0 * np.abs(js) / T)
+            grow = satisfied & ~in_cluster[nodes] & (rng.random(len(nodes)) < p_add)
+            new = np.unique(nodes[grow])
+            in_cluster[new] = True
+            stack.extend(new.tolist())
+
+        cluster = np.flatnonzero(in_cluster)
+        delta_e = -2.0 * np.dot(mu[cluster], spins[cluster])
+        if delta_e <= 0.0 or rng.random() < np.exp(-delta_e / T):
+            conf.config[cluster] = 1 - conf.config[cluster]
+            if state is not None:
+                state.update(*_flip_changes(ham, spins, cluster))
+    if state is not None:
+        state.end_sweep()
+    return conf
+
+
+def swendsen_wang_sweep(ham, conf, T=1.0, rng=None, state=None):
+    """
+    Executes one Swendsen-Wang update of all spins.
+
+    Every satisfied bond (J_ij s_i s_j < 0) is activated with probability 1 - exp(-2|J_ij|/T). Each
+    connected cluster of active bonds is then flipped with the heat-bath probability
+    1 / (1 + exp(dE_mu/T)), where dE_mu = -2 sum_{i in cluster} mu_i s_i, which is 1/2 without a field.
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian, whose CSR couplings are used.
+    conf : BitString
+        The spin configuration, updated in place.
+    T : float, optional
+        The temperature (default is 1.0).
+    rng : numpy.random.Generator, optional
+        The generator; seeds are rejected, since a seed would replay the same numbers every sweep. By default
+        a generator is seeded from the random module.
+    state : SamplerState, optional
+        If given, the energy and magnetization changes of the flipped clusters are added to it.
+
+    Returns
+    -------
+    BitString
+        The updated configuration.
+    """
+    rng = _sweep_generator(rng)
+    mu = np.broadcast_to(ham.mu, (ham.N,))
+    spins = 2.0 * conf.config - 1.0
+
+    # each bond once, from its lower end
+    rows = np.repeat(np.arange(ham.N), np.diff(ham.indptr))
+    upper = ham.indices > rows
+    a, b, js = rows[upper], ham.indices[upper], ham.data[upper]
+    active = (js * spins[a] * spins[b] < 0.0) & (rng.random(len(js)) < -np.expm1(-2.0 * np.abs(js) / T))
+    labels = _connected_components(ham.N, a[active], b[active])
+
+    _, clusters = np.unique(labels, return_inverse=True)
+    delta_e = -2.0 * np.bincount(clusters, weights=mu * spins)
+    p_flip = 0.5 * (1.0 - np.tanh(delta_e / (2.0 * T)))
+    flip = (rng.random(len(delta_e)) < p_flip)[clusters]
+    conf.config[flip] = 1 - conf.config[flip]
+    if state is not None:
+        state.update(*_flip_changes(ham, spins, np.flatnonzero(flip)))
+        state.end_sweep()
+    return conf
+
+
+def _flip_changes(ham, spins, sites):
+    """
+    Returns the energy and magnetization changes of flipping all the given sites of the -1/+1 spins together.
+    """
+    # bonds inside the flipped set keep their energy, so only the field of the other sites matters
+    outside = spins.copy()
+    outside[sites] = 0.0
+    indptr, indices, data = _csr_rows(ham.indptr, ham.indices, ham.data, sites)
+    field = _csr_matvec(indptr, indices, data, outside) + np.broadcast_to(ham.mu, (ham.N,))[sites]
+    return -2.0 * np.dot(spins[sites], field), -2.0 * np.sum(spins[sites])
+
+
+def _connected_components(N, a, b):
+    """
+    Labels the connected components of the graph on N nodes with edges (a, b) by their smallest node.
+    """
+    labels = np.arange(N)
+    while True:
+        old = labels.copy()
+        np.minimum.at(labels, a, labels[b])
+        np.minimum.at(labels, b, labels[a])
+        # pointer jumping shortcuts long chains of labels
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, old):
+            return labels
+
+
+CLUSTER_MOVES = {"wolff": wolff_sweep, "swendsen-wang": swendsen_wang_sweep}
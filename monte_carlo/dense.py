@@ -0,0 +1,329 @@
+import numpy as np
+
+from .ising_hamiltonian import IsingHamiltonian
+from .acceptance import _csr_site_couplings
+
+
+class DenseIsingHamiltonian(IsingHamiltonian):
+    """
+    An Ising Hamiltonian whose couplings are stored as a dense N x N matrix.
+
+    Fully connected models (Sherrington-Kirkpatrick spin glasses, QUBO problems) have N^2 couplings, for which
+    neighbor lists only add index storage and gather overhead. The dense variant keeps J as one contiguous
+    float32 or float64 matrix, so local fields are a BLAS matrix-vector product, the energies of a batch of
+    configurations are one matrix-matrix product, and the sequential sweep updates a local-field vector with
+    one row of J per accepted flip.
+
+    The CSR arrays (indptr, indices, data) of IsingHamiltonian are only built, once, if a method that needs
+    explicit neighbor lists (the Numba kernel, the checkerboard sweep, the cluster moves, Gray-code enumeration
+    or shared memory) asks for them.
+
+    Attributes:
+    - matrix (numpy.ndarray): The symmetric coupling matrix, with a zero diagonal.
+    - N (int): The number of spins.
+    - mu (numpy.ndarray): The external field strength for each spin.
+
+    Methods:
+    - __init__(self, J, mu=0.0, dtype=np.float64): Constructs the Hamiltonian from a coupling matrix.
+    - from_edge_list(edges, mu, N=None, dtype=np.float64): Constructs the Hamiltonian from a list of bonds.
+    - from_hamiltonian(ham, dtype=np.float64): Converts any IsingHamiltonian to dense storage.
+    - load(path, mmap=True, dtype=np.float64): Opens a Hamiltonian written by save() with dense storage.
+    - from_shared_memory(handle, dtype=np.float64): Builds a dense Hamiltonian from a shared memory block.
+    - neighbors(self, i): Returns the sites with a nonzero coupling to site i.
+    - local_fields(self, spins): Computes the coupling field on every site with a matrix product.
+    - delta_e_for_flip(self, i, config): Computes the energy change of a flip from one row of the matrix.
+    - The sequential metropolis_sweep of IsingHamiltonian reads the energy changes from a local-field vector,
+      computed once per sweep unless a SamplerState tracks it, and adds one row of J to it per accepted flip.
+    """
+    _batch_energies_from_fields = True
+
+    def __init__(self, J, mu=0.0, dtype=np.float64):
+        """
+        Constructs a dense Hamiltonian from its coupling matrix.
+
+        Parameters
+        ----------
+        J : array_like or scipy.sparse matrix
+            The symmetric N x N coupling matrix, with E = sum_{i<j} J_ij s_i s_j + sum_i J_ii + sum_i mu_i s_i.
+        mu : float or array_like, optional
+            The external field, uniform or one value per site (default is 0.0).
+        dtype : numpy.dtype, optional
+            The storage type of the matrix, float32 or float64 (default is float64).
+        """
+        J = J.toarray() if hasattr(J, "toarray") else np.asarray(J)
+        if J.ndim != 2 or J.shape[0] != J.shape[1]:
+            raise ValueError("The coupling matrix must be square.")
+        if not np.allclose(J, J.T):
+            raise ValueError("The coupling matrix must be symmetric.")
+        self._set_matrix(J, dtype)
+        self.mu = np.broadcast_to(np.asarray(mu, dtype=float), (self.N,)).copy()
+
+    @classmethod
+    def from_edge_list(cls, edges, mu, N=None, dtype=np.float64):
+        """
+        Builds a dense Hamiltonian from a list of bonds, each bond given once.
+
+        Parameters
+        ----------
+        edges : iterable of (i, j, J) or numpy.ndarray of shape (n_edges, 3)
+            The bonds and their coupling strengths; repeated bonds are added up.
+        mu : array_like
+            The values of the external magnetic field at each spin site.
+        N : int, optional
+            The number of spins (default is len(mu)).
+        dtype : numpy.dtype, optional
+            The storage type of the matrix (default is float64).
+
+        Returns
+        -------
+        DenseIsingHamiltonian
+            The Hamiltonian with the given couplings.
+        """
+        mu = np.array(mu, dtype=float)
+        if N is None:
+            N = len(mu)
+        edges = np.asarray(edges, dtype=float).reshape(-1, 3)
+        i, j = edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64)
+        J = np.zeros((N, N))
+        np.add.at(J, (i, j), edges[:, 2])
+        # self loops are listed once and stay on the diagonal
+        np.add.at(J, (j[i != j], i[i != j]), edges[i != j, 2])
+        return cls(J, mu, dtype)
+
+    @classmethod
+    def from_hamiltonian(cls, ham, dtype=np.float64):
+        """
+        Converts a Hamiltonian with neighbor lists to dense storage.
+
+        Parameters
+        ----------
+        ham : IsingHamiltonian
+            The Hamiltonian to convert.
+        dtype : numpy.dtype, optional
+            The storage type of the matrix (default is float64).
+
+        Returns
+        -------
+        DenseIsingHamiltonian
+            The Hamiltonian with the same couplings, self-coupling energy and field.
+        """
+        J = np.zeros((ham.N, ham.N))
+        rows = np.repeat(np.arange(ham.N), np.diff(ham.indptr))
+        np.add.at(J, (rows, ham.indices), ham.data)
+        dense = cls(J, np.broadcast_to(ham.mu, (ham.N,)), dtype)
+        dense._diag_sum = ham._diag_sum
+        return dense
+
+    @classmethod
+    def load(cls, path, mmap=True, dtype=np.float64):
+        """
+        Opens a Hamiltonian written by save() and stores its couplings as a dense matrix.
+
+        The matrix is built in memory. With mmap the CSR arrays stay memory-mapped, and pickling the
+        Hamiltonian only sends the path and the storage type.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The file to read.
+        mmap : bool, optional
+            Whether to memory-map the CSR arrays rather than read them into memory (default is True).
+        dtype : numpy.dtype, optional
+            The storage type of the matrix (default is float64).
+
+        Returns
+        -------
+        DenseIsingHamiltonian
+            The Hamiltonian stored in the file.
+        """
+        ham = IsingHamiltonian.load(path, mmap)
+        dense = cls.from_hamiltonian(ham, dtype)
+        dense._csr = (ham.indptr, ham.indices, ham.data)
+        if mmap:
+            dense._path = ham._path
+        return dense
+
+    @classmethod
+    def from_shared_memory(cls, handle, dtype=np.float64):
+        """
+        Builds a dense Hamiltonian from a shared memory block; the CSR arrays stay views of the block.
+
+        Parameters
+        ----------
+        handle : SharedHamiltonian
+            The handle returned by to_shared_memory.
+        dtype : numpy.dtype, optional
+            The storage type of the matrix (default is float64).
+
+        Returns
+        -------
+        DenseIsingHamiltonian
+            The Hamiltonian with the couplings of the block.
+        """
+        ham = IsingHamiltonian.from_shared_memory(handle)
+        dense = cls.from_hamiltonian(ham, dtype)
+        dense._csr = (ham.indptr, ham.indices, ham.data)
+        dense._shared = handle
+        return dense
+
+    def __reduce_ex__(self, protocol):
+        """
+        Pickles a Hamiltonian backed by shared memory or a file as its handle or path and its storage type, and
+        any other one by value.
+        """
+        if getattr(self, "_shared", None) is not None:
+            return (type(self).from_shared_memory, (self._shared, self.matrix.dtype))
+        if getattr(self, "_path", None) is not None:
+            return (type(self).load, (self._path, True, self.matrix.dtype))
+        return super().__reduce_ex__(protocol)
+
+    def _set_matrix(self, J, dtype):
+        """
+        Stores the off-diagonal couplings as a contiguous matrix and the self couplings as a constant.
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise ValueError(f"Unsupported matrix type {dtype}, expected float32 or float64.")
+        self.N = J.shape[0]
+        # self couplings only add the constant J_ii to the energy
+        self._diag_sum = float(np.trace(J))
+        self.matrix = np.array(J, dtype=dtype, order="C")
+        np.fill_diagonal(self.matrix, 0.0)
+        self._csr = None
+        self._max_degree = None
+
+    def _set_couplings(self, indptr, indices, data):
+        """
+        Stores CSR couplings, e.g. assigned to J, as a matrix of the current storage type.
+        """
+        N = len(indptr) - 1
+        J = np.zeros((N, N))
+        np.add.at(J, (np.repeat(np.arange(N), np.diff(indptr)), np.asarray(indices)), data)
+        self._set_matrix(J, self.matrix.dtype)
+
+    def __repr__(self):
+        """
+        Returns a string representation of the Hamiltonian.
+        """
+        return f"DenseIsingHamiltonian(N={self.N}, dtype={self.matrix.dtype})"
+
+    @property
+    def indptr(self):
+        """
+        The CSR row pointers of the nonzero couplings, built on first access.
+        """
+        return self._materialize()[0]
+
+    @property
+    def indices(self):
+        """
+        The CSR neighbor indices of the nonzero couplings, built on first access.
+        """
+        return self._materialize()[1]
+
+    @property
+    def data(self):
+        """
+        The CSR coupling strengths, built on first access.
+        """
+        return self._materialize()[2]
+
+    def _materialize(self):
+        """
+        Builds (once) and returns the explicit CSR arrays of the nonzero couplings.
+        """
+        if self._csr is None:
+            rows, cols = np.nonzero(self.matrix)
+            indptr = np.zeros(self.N + 1, dtype=np.int64)
+            np.cumsum(np.bincount(rows, minlength=self.N), out=indptr[1:])
+            index_dtype = np.int32 if self.N < 2**31 else np.int64
+            self._csr = (indptr, cols.astype(index_dtype), self.matrix[rows, cols].astype(float))
+        return self._csr
+
+    def neighbors(self, i):
+        """
+        Returns the sites with a nonzero coupling to site i and the matching coupling strengths.
+
+        Parameters
+        ----------
+        i : int
+            The index of the site.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            The neighbor indices and the coupling strengths.
+        """
+        row = self.matrix[i]
+        nodes = np.flatnonzero(row)
+        return nodes, row[nodes].astype(float)
+
+    def local_fields(self, spins):
+        """
+        Computes the coupling field h_i = sum_j J_ij s_j on every site as spins @ J.
+
+        A batch of configurations is one matrix-matrix product. The product is taken in the type of the
+        matrix and returned in float64.
+
+        Parameters
+        ----------
+        spins : numpy.ndarray
+            Spins in the -1/+1 convention, of shape (N,) or (n_configs, N).
+
+        Returns
+        -------
+        numpy.ndarray
+            The local fields, with the same shape as spins.
+        """
+        fields = np.asarray(spins, dtype=self.matrix.dtype) @ self.matrix
+        return fields.astype(float, copy=False)
+
+    def _entries_per_config(self):
+        """
+        Returns the size of the temporary arrays local_fields allocates per configuration, without building CSR.
+        """
+        return self.N
+
+    def delta_e_for_flip(self, i, config):
+        """
+        Calculates the change in energy if the i-th spin in the configuration is flipped, from row i of J.
+
+        Parameters
+        ----------
+        i : int
+            The index of the spin to flip.
+        config : BitString or numpy.ndarray
+            The spin configuration, or its 0/1 array.
+
+        Returns
+        -------
+        float
+            The change in energy due to flipping the i-th spin.
+        """
+        config = getattr(config, "config", config)
+        delta_si = 2.0 if config[i] == 0 else -2.0
+        return delta_si * (np.dot(2.0 * config - 1.0, self.matrix[i]) + self.mu[i])
+
+    def _site_couplings(self, max_degree):
+        """
+        Returns the degree and sorted, zero-padded couplings of every site, or None if a site has more than
+        max_degree neighbors. The degrees are counted on the matrix once, so dense couplings never build CSR.
+        """
+        if self._max_degree is None:
+            self._max_degree = int(np.count_nonzero(self.matrix, axis=1).max(initial=0))
+        if self.N == 0 or self._max_degree > max_degree:
+            return None
+        return _csr_site_couplings(self.indptr, self.data, max_degree)
+
+    def _sweep_fields(self, conf, tracked):
+        """
+        Returns the local fields for the sequential sweep: the tracked ones, or else one matrix-vector product per
+        sweep, so that every proposal costs O(1).
+        """
+        return tracked if tracked is not None else self.local_fields(2.0 * conf.config - 1.0)
+
+    def _flip_fields(self, fields, i, delta_si):
+        """
+        Adds row i of the matrix, times the change of spin i, to the local fields.
+        """
+        fields += delta_si * self.matrix[i]
@@ -0,0 +1,256 @@
+import numpy as np
+
+
+def _states_to_spins(states, N):
+    """
+    Decodes integer states into spins in the -1/+1 convention.
+
+    Bit N-1-i of a state is the value of site i, matching BitString.set_int_config.
+
+    Parameters
+    ----------
+    states : numpy.ndarray
+        1D array of integer states, each below 2**N.
+    N : int
+        The number of spins.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array of shape (len(states), N) with entries -1.0 or +1.0.
+    """
+    shifts = np.arange(N - 1, -1, -1, dtype=np.int64)
+    bits = (states[:, None] >> shifts) & 1
+    return 2.0 * bits - 1.0
+
+
+def _enumerate_chunks(ham, chunk_size=2**14):
+    """
+    Yields the energies and magnetizations of all 2**N states, chunk_size states at a time.
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian whose states are enumerated.
+    chunk_size : int, optional
+        The number of states handled per chunk, which bounds the memory used (default is 2**14).
+
+    Yields
+    ------
+    tuple of numpy.ndarray
+        The energies and magnetizations of the states in the chunk.
+    """
+    if ham.N > 62:
+        raise ValueError("Exact enumeration is limited to N <= 62 spins.")
+
+    n_states = 2 ** ham.N
+    for start in range(0, n_states, chunk_size):
+        states = np.arange(start, min(start + chunk_size, n_states), dtype=np.int64)
+        spins = _states_to_spins(states, ham.N)
+        yield ham._spin_energies(spins), spins.sum(axis=1)
+
+
+def _enumerate_gray(ham, chunk_size=2**14):
+    """
+    Yields the energies and magnetizations of all 2**N states, walking the high spins in Gray-code order.
+
+    The lowest log2(chunk_size) spins form a block of states whose energies are computed once. Each
+    further block differs from the previous one by a single high spin, so its energies are updated in
+    O(degree) array operations from the local field of that spin instead of being recomputed.
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian whose states are enumerated.
+    chunk_size : int, optional
+        The number of states in a block, rounded down to a power of two (default is 2**14).
+
+    Yields
+    ------
+    tuple of numpy.ndarray
+        The energies and magnetizations of the states in the block.
+    """
+    if ham.N > 62:
+        raise ValueError("Exact enumeration is limited to N <= 62 spins.")
+
+    n_low = min(ham.N, max(int(chunk_size).bit_length() - 1, 0))
+    spins = _states_to_spins(np.arange(2 ** n_low, dtype=np.int64), ham.N)
+    E = ham._spin_energies(spins)
+    M = spins.sum(axis=1)
+    yield E, M
+
+    for k in range(1, 2 ** (ham.N - n_low)):
+        # Gray codes k-1 and k differ in the lowest set bit of k
+        bit = (k & -k).bit_length() - 1
+        site = ham.N - 1 - n_low - bit
+
+        lo, hi = ham.indptr[site], ham.indptr[site + 1]
+        field = spins[:, ham.indices[lo:hi]] @ ham.data[lo:hi] + ham.mu[site]
+
+        delta_si = -2.0 * spins[0, site]
+        E = E + delta_si * field
+        M = M + delta_si
+        spins[:, site] = -spins[:, site]
+        yield E, M
+
+
+_ENUMERATORS = {"chunked": _enumerate_chunks, "gray": _enumerate_gray}
+
+
+def _enumerate(ham, method="chunked", chunk_size=2**14):
+    """
+    Returns the state generator selected by method ("chunked" or "gray").
+    """
+    if method not in _ENUMERATORS:
+        raise ValueError(f"Unknown enumeration method {method!r}, expected one of {sorted(_ENUMERATORS)}.")
+    return _ENUMERATORS[method](ham, chunk_size)
+
+
+class _BoltzmannSums:
+    """
+    Accumulates Boltzmann-weighted sums of E, E^2, M and M^2 at one temperature.
+
+    The sums are kept relative to the largest weight seen so far (log-sum-exp), so
+    exp(-E/T) never overflows, whatever the size of the system or the temperature.
+    """
+    def __init__(self, T):
+        self.T = T
+        self.shift = -np.inf
+        self.Z = 0.0
+        self.E = 0.0
+        self.EE = 0.0
+        self.M = 0.0
+        self.MM = 0.0
+
+    def add(self, E, M, counts=1.0):
+        """
+        Adds states with energies E and magnetizations M, each occurring counts times.
+        """
+        log_w = -E / self.T
+        top = np.max(log_w)
+        if top > self.shift:
+            scale = np.exp(self.shift - top)
+            self.Z *= scale
+            self.E *= scale
+            self.EE *= scale
+            self.M *= scale
+            self.MM *= scale
+            self.shift = top
+
+        w = counts * np.exp(log_w - self.shift)
+        self.Z += np.sum(w)
+        self.E += np.dot(w, E)
+        self.EE += np.dot(w, E * E)
+        self.M += np.dot(w, M)
+        self.MM += np.dot(w, M * M)
+
+    def averages(self):
+        """
+        Returns the average energy, magnetization, heat capacity and magnetic susceptibility.
+        """
+        E = self.E / self.Z
+        M = self.M / self.Z
+        EE = self.EE / self.Z
+        MM = self.MM / self.Z
+
+        HC = (EE - E * E) / (self.T * self.T)
+        MS = (MM - M * M) / self.T
+        return E, M, HC, MS
+
+
+class DensityOfStates:
+    """
+    The number of states g(E, M) with each energy E and magnetization M, obtained by exact enumeration.
+
+    Once built, thermal averages at any temperature are a reweighting of the histogram, so scanning
+    many temperatures costs one enumeration plus O(number of distinct (E, M) pairs) per temperature.
+
+    Attributes:
+    - energies (numpy.ndarray): The distinct energies, rounded to the given number of decimals.
+    - magnetizations (numpy.ndarray): The magnetization paired with each energy.
+    - counts (numpy.ndarray): The number of states with each (energy, magnetization) pair.
+
+    Methods:
+    - from_hamiltonian(ham, method="gray", chunk_size=2**14, decimals=8): Enumerates all states of ham.
+    - averages(self, T): Returns E, M, heat capacity and susceptibility for one or many temperatures.
+    """
+    def __init__(self, energies, magnetizations, counts):
+        """
+        Constructs a DensityOfStates from its histogram.
+
+        Parameters
+        ----------
+        energies : numpy.ndarray
+            The distinct energies.
+        magnetizations : numpy.ndarray
+            The magnetization paired with each energy.
+        counts : numpy.ndarray
+            The number of states with each (energy, magnetization) pair.
+        """
+        self.energies = np.asarray(energies, dtype=float)
+        self.magnetizations = np.asarray(magnetizations, dtype=float)
+        self.counts = np.asarray(counts, dtype=float)
+
+    def __repr__(self):
+        """
+        Returns a string representation of the density of states.
+        """
+        return f"DensityOfStates({len(self.counts)} bins, {self.counts.sum():.0f} states)"
+
+    @classmethod
+    def from_hamiltonian(cls, ham, method="gray", chunk_size=2**14, decimals=8):
+        """
+        Enumerates all 2**N states of ham once and histograms their energies and magnetizations.
+
+        Parameters
+        ----------
+        ham : IsingHamiltonian
+            The Hamiltonian whose states are enumerated.
+        method : str, optional
+            The enumeration order, "chunked" or "gray" (default is "gray").
+        chunk_size : int, optional
+            The number of states handled at once (default is 2**14).
+        decimals : int, optional
+            Energies are rounded to this many decimals before binning, so that round-off does not
+            split a level into several bins (default is 8).
+
+        Returns
+        -------
+        DensityOfStates
+            The histogram of all states.
+        """
+        energies = np.zeros(0)
+        magnetizations = np.zeros(0)
+        counts = np.zeros(0, dtype=np.int64)
+        for E, M in _enumerate(ham, method, chunk_size):
+            keys = np.stack((np.concatenate((energies, np.round(E, decimals))),
+                             np.concatenate((magnetizations, M))), axis=1)
+            keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+            counts = np.bincount(inverse.ravel(), weights=np.concatenate((counts, np.ones(len(E)))))
+            energies, magnetizations = keys[:, 0], keys[:, 1]
+        return cls(energies, magnetizations, counts)
+
+    def averages(self, T):
+        """
+        Returns the thermal averages at one or many temperatures by reweighting the histogram.
+
+        Parameters
+        ----------
+        T : float or array_like
+            The temperature(s).
+
+        Returns
+        -------
+        tuple
+            The average energy, magnetization, heat capacity and magnetic susceptibility, each a
+            float for a scalar T or an array matching the shape of T.
+        """
+        Ts = np.asarray(T, dtype=float)
+        results = np.zeros((4,) + Ts.shape)
+        for idx, Ti in np.ndenumerate(Ts):
+            sums = _BoltzmannSums(Ti)
+            sums.add(self.energies, self.magnetizations, self.counts)
+            results[(slice(None),) + idx] = sums.averages()
+        if Ts.ndim == 0:
+            return tuple(float(r) for r in results)
+        return tuple(results)
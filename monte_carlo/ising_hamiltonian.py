@@ -1,5 +1,18 @@
 import numpy as np
+import os
 import random
+import functools
+
+from .kernels import _compiled_sweep, _numba_available
+from .random_streams import _sweep_generator
+from .enumeration import _enumerate, _BoltzmannSums, DensityOfStates
+from .shared import SharedHamiltonian
+from .storage import _write_csr, _map_csr
+from .transfer_matrix import _bonds, _strip_width, _transfer_matrix_solve
+from .acceptance import _delta_e_values, _csr_site_couplings, _LRUCache, ACCEPTANCE_CACHE_SIZE, TABLE_SCALE
+
+SWEEP_METHODS = ("sequential", "numba", "checkerboard")
+
 
 class IsingHamiltonian:
     """
@@ -7,45 +20,260 @@ class IsingHamiltonian:
 
     Attributes:
 
-    J: A 2D array of size (N x N) representing the interaction strength between spins, where N is the number of spins. J[i][j] represents the interaction strength between spins i and j.
+    N: The number of spins.
+    indptr, indices, data: The couplings in compressed sparse row form. The neighbors of site i are indices[indptr[i]:indptr[i+1]] and data holds the matching interaction strengths.
     mu: A 1D array of size N representing the external field strength for each spin.
+    J: The couplings as a list of length N of (neighbor, J) tuples, rebuilt from the CSR arrays on access.
     nodes: A list of length N, where each element is a 1D array containing the indices of the spins that interact with the corresponding spin.
     js: A list of length N, where each element is a 1D array containing the corresponding interaction strengths for the spins in the corresponding node.
     Methods:
 
-    init(self, J=[[()]], mu=np.zeros(1)): Constructs an instance of the IsingHamiltonian class with given interaction strength J and external field strength mu. Initializes nodes and js attributes.
+    init(self, J=[[()]], mu=np.zeros(1)): Constructs an instance of the IsingHamiltonian class with given interaction strength J and external field strength mu. Builds the CSR coupling arrays.
+    from_edge_list(edges, mu, N=None): Constructs an instance from a list of (i, j, J) bonds.
+    to_shared_memory(self): Copies the coupling arrays and mu into shared memory and returns a handle to them.
+    from_shared_memory(handle): Constructs a read-only instance on the shared arrays, without copying them.
+    save(self, path): Writes the coupling arrays and mu to a binary file.
+    load(path, mmap=True): Constructs a read-only instance memory-mapped from a file written by save().
+    local_fields(self, spins): Computes the coupling field on every site with a sparse matrix-vector product.
     energy(self, config): Computes the energy of the system for a given configuration of spins.
+    energy_batch(self, spins, chunk_size=None): Computes the energies of an (M, N) array of 0/1 or -1/+1 spins in bounded-memory chunks.
+    magnetization_batch(self, spins, chunk_size=None): Computes the magnetizations of an (M, N) array of 0/1 or -1/+1 spins.
     delta_e_for_flip(self, i, config): Computes the change in energy due to a flip of the spin at index i for a given configuration of spins.
-    metropolis_sweep(self, conf, T=1.0): Performs a single Metropolis sweep of the Ising Hamiltonian system for a given configuration of spins and temperature T.
+    neighbors(self, i): Returns the neighbor indices and coupling strengths of site i.
+    metropolis_sweep(self, conf, T=1.0, method="sequential", rng=None, state=None): Performs a single Metropolis sweep of the Ising Hamiltonian system for a given configuration of spins and temperature T.
+    batch_metropolis_sweep(self, configs, T=1.0, rng=None, state=None): Performs a checkerboard Metropolis sweep on an (n_chains, N) array of configurations.
+    coloring(self): Returns a cached coloring of the coupling graph, used by the checkerboard sweep.
+    delta_e_values(self): Returns the distinct energy changes of single spin flips, for few-valued couplings.
+    acceptance_table(self, T): Returns the cached acceptance probabilities of the uphill energy changes at T.
     compute_average_values(self, conf, T): Computes the average energy, magnetization, specific heat, and magnetic susceptibility of the Ising Hamiltonian system for a given configuration of spins and temperature T.
+    density_of_states(self): Enumerates all states once and returns the histogram g(E, M).
+    compute_average_values_over(self, Ts): Computes the same averages for an array of temperatures from a single enumeration.
+    strip_width(self, max_width=8): Detects a chain or ladder structure of the couplings.
+    transfer_matrix_solve(self, Ts, max_width=8): Computes log Z and the averages of a chain or ladder exactly with transfer matrices.
     """
+    # whether batches of energies are computed from local fields rather than from a list of bonds, for subclasses
+    # whose local fields do not need the CSR arrays
+    _batch_energies_from_fields = False
+
     def __init__(self, J=[[(0)]], mu=np.zeros(1)):
         """
         Initializes the IsingHamiltonian object with the given coupling coefficients and external magnetic field values.
 
+        The couplings are stored in compressed sparse row (CSR) form: the neighbors of site i are
+        indices[indptr[i]:indptr[i+1]] and the matching coupling strengths are data[indptr[i]:indptr[i+1]].
+        Every bond must be listed from both of its ends with the same strength, i.e. the coupling matrix must be
+        symmetric; otherwise a ValueError is raised, as by DenseIsingHamiltonian.
+        Self couplings J_ii only shift the energy by a constant, which is kept aside from the CSR arrays.
+
         Parameters:
-        J (list of lists of tuples): The coupling coefficients between each pair of spins in the Ising model.
+        J (list of lists of tuples or scipy.sparse matrix): The coupling coefficients between each pair of spins in the Ising model.
         mu (ndarray): The values of the external magnetic field at each spin site.
 
         Returns:
         None
         """
-        self.J = J
-        self.mu = mu
+        self._set_couplings(*_couplings_to_csr(J))
+        self.mu = np.array(mu)
+
+    @classmethod
+    def from_edge_list(cls, edges, mu, N=None):
+        """
+        Builds an IsingHamiltonian from a list of bonds, each bond given once.
 
-        self.nodes = []
-        self.js = []
+        Parameters:
+        edges (iterable of (i, j, J) or ndarray of shape (n_edges, 3)): The bonds and their coupling strengths.
+        mu (ndarray): The values of the external magnetic field at each spin site.
+        N (int): The number of spins. Defaults to len(mu).
+
+        Returns:
+        IsingHamiltonian: The Hamiltonian with the given couplings.
+        """
+        mu = np.array(mu)
+        if N is None:
+            N = len(mu)
+        edges = np.asarray(edges, dtype=float).reshape(-1, 3)
+        ham = cls.__new__(cls)
+        ham._set_couplings(*_edges_to_csr(N, edges[:, 0].astype(np.int64), edges[:, 1].astype(np.int64), edges[:, 2]))
+        ham.mu = mu
+        return ham
+
+    def to_shared_memory(self):
+        """
+        Copies the coupling arrays and the external field into a multiprocessing.shared_memory block.
 
-        for i in range(len(self.J)):
-            node_arr = np.zeros(len(self.J[i]), dtype=int)
-            j_arr = np.zeros(len(self.J[i]))
-            for j, (node, j_val) in enumerate(self.J[i]):
-                node_arr[j] = node
-                j_arr[j] = j_val
-            self.nodes.append(node_arr)
-            self.js.append(j_arr)
+        The returned handle is small to pickle, and from_shared_memory rebuilds a read-only Hamiltonian from
+        it in any process on the machine without copying the arrays, so many workers can sample one large
+        model at the memory cost of one. The caller owns the block and frees it with the handle's with
+        statement, or its close() and unlink() methods, once the workers are done.
+
+        Returns:
+        SharedHamiltonian: The handle to the shared block.
+        """
+        return SharedHamiltonian(self.indptr, self.indices, self.data, np.broadcast_to(self.mu, (self.N,)),
+                                 self._diag_sum)
+
+    @classmethod
+    def from_shared_memory(cls, handle):
+        """
+        Builds a Hamiltonian on the arrays of a shared memory block, without copying them.
+
+        The CSR arrays and mu are read-only views of the block. Pickling the Hamiltonian only sends the handle,
+        so it can be passed on to further workers just as cheaply.
+
+        Parameters:
+        handle (SharedHamiltonian): The handle returned by to_shared_memory.
+
+        Returns:
+        IsingHamiltonian: The Hamiltonian backed by the shared block.
+        """
+        arrays = handle.arrays()
+        ham = cls.__new__(cls)
+        ham.N = handle.N
+        ham._diag_sum = handle.diag_sum
+        ham.indptr, ham.indices, ham.data, ham.mu = (arrays[key] for key in ("indptr", "indices", "data", "mu"))
+        ham._shared = handle
+        return ham
+
+    def save(self, path):
+        """
+        Writes the Hamiltonian to a binary file that load() can memory-map.
 
-        self.mu = np.array(self.mu)
+        The file holds a small header (format version, N, number of couplings, index size and the energy of the
+        self couplings) followed by the flat indptr, indices, data and mu arrays, each 64-byte aligned.
+
+        Parameters:
+        path (str or os.PathLike): The file to write.
+        """
+        _write_csr(path, self.indptr, self.indices, self.data, np.broadcast_to(self.mu, (self.N,)), self._diag_sum)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Opens a Hamiltonian written by save().
+
+        With mmap the arrays are read-only np.memmap views of the file, so opening even a huge model is
+        instant and the pages are only read from disk when a sweep touches them. Pickling such a Hamiltonian
+        only sends the path, and processes that load the same file share its pages through the page cache.
+
+        Parameters:
+        path (str or os.PathLike): The file to read.
+        mmap (bool): Whether to memory-map the arrays rather than read them into memory. Defaults to True.
+
+        Returns:
+        IsingHamiltonian: The Hamiltonian stored in the file.
+        """
+        N, diag_sum, arrays = _map_csr(path, mmap)
+        ham = cls.__new__(cls)
+        ham.N = N
+        ham._diag_sum = diag_sum
+        ham.indptr, ham.indices, ham.data, ham.mu = (arrays[key] for key in ("indptr", "indices", "data", "mu"))
+        if mmap:
+            # absolute, so that a pickle sent to a process with another working directory still finds the file
+            ham._path = os.path.abspath(path)
+        return ham
+
+    def __getstate__(self):
+        """
+        Returns the attributes pickled by value, without the bond arrays, which are rebuilt on demand.
+        """
+        state = self.__dict__.copy()
+        state.pop("_bond_arrays", None)
+        return state
+
+    def __reduce_ex__(self, protocol):
+        """
+        Pickles a Hamiltonian backed by shared memory as its handle, one mapped from a file as its path, and any
+        other one by value.
+        """
+        if getattr(self, "_shared", None) is not None:
+            return (type(self).from_shared_memory, (self._shared,))
+        if getattr(self, "_path", None) is not None:
+            return (type(self).load, (self._path,))
+        return super().__reduce_ex__(protocol)
+
+    def _set_couplings(self, indptr, indices, data):
+        """
+        Stores the CSR coupling arrays, using the smallest index type that fits.
+        """
+        self.N = len(indptr) - 1
+        indptr = np.asarray(indptr, dtype=np.int64)
+        indices = np.asarray(indices)
+        data = np.asarray(data, dtype=float)
+
+        # self couplings only add the constant J_ii to the energy; they are kept out of the CSR arrays so
+        # that local fields and flip energies only see the other sites
+        rows = np.repeat(np.arange(self.N), np.diff(indptr))
+        diag = indices == rows
+        self._diag_sum = float(data[diag].sum())
+        if diag.any():
+            indptr = np.concatenate(([0], np.cumsum(np.bincount(rows[~diag], minlength=self.N))))
+            indices = indices[~diag]
+            data = data[~diag]
+
+        index_dtype = np.int32 if self.N < 2**31 else np.int64
+        self.indptr = np.ascontiguousarray(indptr, dtype=np.int64)
+        self.indices = np.ascontiguousarray(indices, dtype=index_dtype)
+        self.data = np.ascontiguousarray(data, dtype=float)
+
+    @property
+    def J(self):
+        """
+        The couplings as a list of lists of (neighbor, J) tuples, one list per site.
+
+        The lists are built from the CSR arrays on every access, in one pass over the sites, so reading J costs
+        O(N + number of couplings); loops should read nodes and js, or indptr, indices and data, instead.
+        """
+        return [list(zip(nodes.tolist(), js.tolist())) for nodes, js in zip(self.nodes, self.js)]
+
+    @J.setter
+    def J(self, J):
+        """
+        Replaces the couplings, given in any form the constructor accepts, and drops everything derived from them.
+        """
+        self._set_couplings(*_couplings_to_csr(J))
+        # the colorings, bond lists and acceptance tables were built for the old couplings, and a file or shared
+        # block no longer describes the Hamiltonian
+        for name in ("_colors", "_color_classes", "_bond_arrays", "_delta_e_cache", "_path", "_shared"):
+            self.__dict__.pop(name, None)
+
+    @property
+    def nodes(self):
+        """
+        A list of length N with the neighbor indices of each site (views into indices).
+        """
+        return np.split(self.indices, self.indptr[1:-1])
+
+    @property
+    def js(self):
+        """
+        A list of length N with the coupling strengths of each site (views into data).
+        """
+        return np.split(self.data, self.indptr[1:-1])
+
+    def neighbors(self, i):
+        """
+        Returns the neighbors of site i and the matching coupling strengths.
+
+        Parameters:
+        i (int): The index of the site.
+
+        Returns:
+        tuple: The neighbor indices and the coupling strengths, as arrays.
+        """
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.indices[lo:hi], self.data[lo:hi]
+
+    def local_fields(self, spins):
+        """
+        Computes the coupling field h_i = sum_j J_ij s_j on every site.
+
+        Parameters:
+        spins (ndarray): Spins in the -1/+1 convention, of shape (N,) or (n_configs, N).
+
+        Returns:
+        ndarray: The local fields, with the same shape as spins.
+        """
+        return _csr_matvec(self.indptr, self.indices, self.data, spins)
 
     def energy(self, config):
         """
@@ -57,23 +285,91 @@ class IsingHamiltonian:
         Returns:
         float: The energy of the spin configuration.
         """
-        if len(config.config) != len(self.J):
+        if len(config.config) != self.N:
             raise ValueError("The configuration's length does not match the Hamiltonian's dimension.")
 
-        energy = 0.0
-        for i in range(config.N):
-            for j, (node, j_val) in enumerate(self.J[i]):
-                if node < i:
-                    continue
-                if config[i] == config[node]:
-                    energy += j_val
-                else:
-                    energy -= j_val
+        return self._spin_energies(2.0 * config.config - 1.0)
+
+    def energy_batch(self, spins, chunk_size=None):
+        """
+        Calculates the energies of many spin configurations at once.
 
-        energy += np.dot(self.mu, 2*config.config-1)
+        The configurations are processed chunk_size at a time, each chunk with one vectorized local-field
+        product (sparse, stencil or dense, depending on the Hamiltonian), so snapshots, enumeration chunks or
+        many chains need neither a Python loop nor a BitString per configuration, and the temporary arrays
+        stay bounded whatever the number of configurations.
 
+        Parameters:
+        spins (ndarray): Configurations of shape (M, N), or a single one of shape (N,), of any integer, boolean or
+            float type, with spins either all 0/1 or all -1/+1. The convention is detected from the values.
+        chunk_size (int): The number of configurations per chunk. Defaults to enough configurations for about
+            2**22 temporary entries.
+
+        Returns:
+        ndarray: The M energies (a 0-d array for a single configuration).
+        """
+        return self._batch(spins, chunk_size, self._spin_energies)
+
+    def magnetization_batch(self, spins, chunk_size=None):
+        """
+        Calculates the magnetizations of many spin configurations at once.
+
+        Parameters:
+        spins (ndarray): Configurations of shape (M, N) or (N,), with spins all 0/1 or all -1/+1, as in energy_batch.
+        chunk_size (int): The number of configurations per chunk. Defaults as in energy_batch.
+
+        Returns:
+        ndarray: The M magnetizations (a 0-d array for a single configuration).
+        """
+        return self._batch(spins, chunk_size, lambda chunk: chunk.sum(axis=-1))
+
+    def _batch(self, spins, chunk_size, function):
+        """
+        Applies function to -1/+1 float chunks of the configurations spins and concatenates the results.
+        """
+        spins = np.asarray(spins)
+        if spins.shape[-1:] != (self.N,) or spins.ndim > 2:
+            raise ValueError(f"Expected configurations of shape (M, {self.N}), got {spins.shape}.")
+        if chunk_size is None:
+            chunk_size = max(1, 2**22 // max(self._entries_per_config(), 1))
+        configs = spins.reshape(-1, self.N)
+        out = np.empty(len(configs))
+        # -1 anywhere means the -1/+1 convention, otherwise the spins are 0/1
+        signed = configs.size > 0 and configs.min() < 0
+        for start in range(0, len(configs), chunk_size):
+            out[start:start + chunk_size] = function(_as_spins(configs[start:start + chunk_size], signed))
+        return out.reshape(spins.shape[:-1])
+
+    def _entries_per_config(self):
+        """
+        Returns the size of the temporary arrays local_fields allocates per configuration.
+        """
+        return max(self.N, int(self.indptr[-1]))
+
+    def _spin_energies(self, spins):
+        """
+        Computes the energies of -1/+1 spins of shape (N,) or (n_configs, N).
+        """
+        energy = self._coupling_energies(spins) + self._diag_sum
+        energy += spins @ self.mu
         return energy
 
+    def _coupling_energies(self, spins):
+        """
+        Computes sum_{i<j} J_ij s_i s_j for -1/+1 spins of shape (N,) or (n_configs, N).
+        """
+        if spins.ndim == 1 or self._batch_energies_from_fields:
+            # each bond is seen from both ends
+            return 0.5 * np.sum(spins * self.local_fields(spins), axis=-1)
+        # one product per bond, gathered from the transposed spins so that each gathered row is contiguous
+        bonds = getattr(self, "_bond_arrays", None)
+        if bonds is None:
+            i, j, J = _bonds(self)
+            bonds = self._bond_arrays = (i.astype(self.indices.dtype), j.astype(self.indices.dtype), J)
+        i, j, J = bonds
+        spins_t = np.ascontiguousarray(spins.T)
+        return J @ (spins_t[i] * spins_t[j])
+
     def delta_e_for_flip(self, i, config):
         """
         Calculates the change in energy if the i-th spin in the configuration is flipped.
@@ -85,78 +381,429 @@ class IsingHamiltonian:
         Returns:
         float: The change in energy due to flipping the i-th spin.
         """
-        delta_e = 0.0
-        delta_si = 2
+        nodes, js = self.neighbors(i)
+        delta_si = 2.0
         if config[i] == 1:
-            delta_si = -2
+            delta_si = -2.0
 
-        for j, j_val in enumerate(self.nodes[i]):
-            delta_e += (2.0*config[j_val]-1.0) * self.js[i][j] * delta_si
-
-        delta_e += self.mu[i] * delta_si
+        neighbor_spins = 2.0 * config[nodes] - 1.0
+        delta_e = delta_si * (np.dot(neighbor_spins, js) + self.mu[i])
         return delta_e
 
-    def metropolis_sweep(self, conf, T=1.0):
+    def metropolis_sweep(self, conf, T=1.0, method="sequential", rng=None, state=None):
         """
         Executes a single Metropolis sweep of the Ising model at the given temperature.
 
         Parameters:
         conf (IsingConfig): The initial spin configuration for the Metropolis sweep.
         T (float): The temperature at which the Metropolis sweep is to be performed.
+        method (str): "sequential" runs the pure Python sweep. "numba" runs a compiled kernel on the CSR arrays;
+            it falls back to the sequential sweep when Numba is not installed. "checkerboard" updates all sites
+            of one color of coloring() at once with array operations, since sites of the same color do not interact.
+        rng (numpy.random.Generator): The generator the uniforms are drawn from, one block per sweep; seeds are
+            rejected with a TypeError, since a seed would replay the same block every sweep, so convert them
+            once with numpy.random.default_rng. Without it the sequential sweep runs in compatibility mode, drawing
+            one number from the random module per uphill move as it always has, so runs seeded with random.seed()
+            reproduce; the other methods seed a new generator from the random module every sweep.
+        state (SamplerState): If given, the energy and magnetization changes of the accepted flips are added to it.
+            If it tracks local fields, the sequential sweep reads the energy changes from them and updates the
+            fields of the neighbors of every accepted flip; the other methods mark them stale.
 
         Returns:
         IsingConfig: The spin configuration after the Metropolis sweep.
         """
+        if method not in SWEEP_METHODS:
+            raise ValueError(f"Unknown sweep method {method!r}, expected one of {SWEEP_METHODS}.")
+        if method == "numba" and self._compiled_sweep(conf, T, rng, state):
+            return conf
+        if method == "checkerboard":
+            return self._checkerboard_sweep(conf, T, rng, state)
+
+        if rng is not None:
+            # Python floats, which compare faster than numpy scalars in the loop
+            rand = _sweep_generator(rng).random(conf.N).tolist()
+        table = self.acceptance_table(T)
+        # with local fields the energy change is a lookup and only accepted flips touch the neighbors
+        tracked = state.fields() if state is not None else None
+        fields = self._sweep_fields(conf, tracked)
+        total_de = 0.0
+        total_dm = 0
         for site_i in range(conf.N):
-            delta_e = self.delta_e_for_flip(site_i, conf.config)      
+            if fields is None:
+                delta_e = self.delta_e_for_flip(site_i, conf.config)
+            else:
+                delta_si = 2.0 if conf.config[site_i] == 0 else -2.0
+                delta_e = delta_si * (fields[site_i] + self.mu[site_i])
             accept = True
             if delta_e > 0.0:
                 # prob_trans = np.exp(-delta_e/T)
-                rand_comp = random.random()
-                if rand_comp > np.exp(-delta_e/T):
+                rand_comp = random.random() if rng is None else rand[site_i]
+                prob_trans = table.get(round(float(delta_e) * TABLE_SCALE)) if table is not None else None
+                if prob_trans is None:
+                    prob_trans = np.exp(-delta_e/T)
+                if rand_comp > prob_trans:
                     accept = False
             if accept:
+                total_de += delta_e
+                if fields is not None:
+                    self._flip_fields(fields, site_i, delta_si)
                 if conf.config[site_i] == 0:
                     conf.config[site_i] = 1
+                    total_dm += 2
                 else:
                     conf.config[site_i] = 0
+                    total_dm -= 2
+        if state is not None:
+            state.update(total_de, total_dm, fields_updated=tracked is not None)
+            state.end_sweep()
         return conf
 
+    def _sweep_fields(self, conf, tracked):
+        """
+        Returns the local fields the sequential sweep reads its energy changes from: those tracked by a
+        SamplerState, or None to evaluate delta_e_for_flip at every site.
+        """
+        return tracked
+
+    def _flip_fields(self, fields, i, delta_si):
+        """
+        Updates the local fields of the sequential sweep after spin i changed by delta_si.
+        """
+        nodes, js = self.neighbors(i)
+        fields[nodes] += delta_si * js
+
     
-    def compute_average_values(self, conf, T):
+    def delta_e_values(self):
+        """
+        Returns the distinct energy changes a single spin flip can cause, for few-valued couplings and fields.
+
+        Sites with the same field and the same couplings form a class, and every sign pattern of a class's
+        neighbors is enumerated. Values that share the key round(dE * TABLE_SCALE) are listed once. The result
+        is cached until the values of mu change, in place or by assignment.
+
+        Returns:
+        ndarray or None: The sorted energy changes, or None when the couplings are continuous, i.e. there are too
+            many distinct values (or neighbors) to tabulate.
+        """
+        cached = getattr(self, "_delta_e_cache", None)
+        if cached is None or not np.array_equal(cached[0], self.mu):
+            # a copy, so that changing mu in place is noticed
+            cached = self._delta_e_cache = (np.array(self.mu), _delta_e_values(self), _LRUCache(ACCEPTANCE_CACHE_SIZE))
+        return cached[1]
+
+    def _site_couplings(self, max_degree):
+        """
+        Returns the degree of every site and its sorted couplings, zero-padded to the largest degree, or None if a
+        site has more than max_degree neighbors.
+        """
+        return _csr_site_couplings(self.indptr, self.data, max_degree)
+
+    def acceptance_table(self, T):
+        """
+        Returns the Metropolis acceptance probabilities exp(-dE/T) of the uphill energy changes at temperature T.
+
+        The sequential sweep looks the probabilities up instead of evaluating the exponential for every uphill
+        move. Tables are kept for the ACCEPTANCE_CACHE_SIZE most recently used temperatures, so a scan that
+        revisits temperatures does not rebuild them. An energy change dE is stored under the integer key
+        round(dE * TABLE_SCALE), which the sweep computes in a fraction of the time of the exponential; the
+        rounding also lets a change summed in another order find its entry. Energy changes that are missing
+        from the table are evaluated directly.
+
+        Parameters:
+        T (float): The temperature.
+
+        Returns:
+        dict or None: The acceptance probability of each positive energy change, by key, or None for continuous
+            couplings.
+        """
+        values = self.delta_e_values()
+        if values is None:
+            return None
+        uphill = values[values > 0.0].tolist()
+        return self._delta_e_cache[2].lookup(float(T),
+                                             lambda: {round(dE * TABLE_SCALE): float(np.exp(-dE/T)) for dE in uphill})
+
+    def _compiled_sweep(self, conf, T, rng, state=None):
+        """
+        Runs the Numba sweep kernel on conf, returning False if Numba is not installed.
+        """
+        if not _numba_available():
+            return False
+        spins = conf.config
+        if spins.dtype not in (np.uint8, np.int8):
+            spins = spins.astype(np.uint8)
+        delta_e, delta_m = _compiled_sweep(self, spins, _sweep_generator(rng).random(conf.N), T)
+        if spins is not conf.config:
+            conf.config[:] = spins
+        if state is not None:
+            state.update(delta_e, delta_m)
+            state.end_sweep()
+        return True
+
+    def coloring(self):
+        """
+        Colors the coupling graph so that no two coupled sites share a color.
+
+        The greedy coloring visits sites in index order, which gives the two checkerboard colors for
+        bipartite lattices numbered row by row. It is computed once and cached on the Hamiltonian.
+
+        Returns:
+        ndarray: The color of each site, numbered from 0.
+        """
+        if getattr(self, "_colors", None) is None:
+            colors = np.full(self.N, -1, dtype=np.int64)
+            for i in range(self.N):
+                lo, hi = self.indptr[i], self.indptr[i + 1]
+                taken = set(colors[self.indices[lo:hi]].tolist())
+                color = 0
+                while color in taken:
+                    color += 1
+                colors[i] = color
+            self._colors = colors
+            self._color_classes = None
+        return self._colors
+
+    def _color_class_fields(self):
+        """
+        Returns, for each color, its sites and a function computing the local fields on those sites from the spins.
+        """
+        if getattr(self, "_color_classes", None) is None:
+            colors = self.coloring()
+            self._color_classes = []
+            for color in range(colors.max() + 1):
+                sites = np.flatnonzero(colors == color)
+                rows = _csr_rows(self.indptr, self.indices, self.data, sites)
+                self._color_classes.append((sites, functools.partial(_csr_matvec, *rows)))
+        return self._color_classes
+
+    def _checkerboard_sweep(self, conf, T, rng, state=None):
+        """
+        Runs one Metropolis sweep updating a whole color class of sites at a time.
+        """
+        self.batch_metropolis_sweep(conf.config, T=T, rng=rng, state=state)
+        return conf
+
+    def batch_metropolis_sweep(self, configs, T=1.0, rng=None, state=None):
+        """
+        Executes a single checkerboard Metropolis sweep on many independent configurations at once.
+
+        Sites of the same color of coloring() do not interact, so each color class of every configuration is
+        updated together with array operations; the cost scales with the array size, not with Python loops.
+
+        Parameters:
+        configs (ndarray): 0/1 spin configurations of shape (N,) or (n_chains, N), updated in place.
+        T (float): The temperature at which the Metropolis sweep is to be performed.
+        rng (numpy.random.Generator): The generator for the acceptance tests (seeds are rejected, as in
+            metropolis_sweep). By default a generator is seeded from the random module every sweep.
+        state (SamplerState): If given, the energy and magnetization changes of the accepted flips are added to
+            it, one value per configuration.
+
+        Returns:
+        ndarray: The updated configurations.
+        """
+        rng = _sweep_generator(rng)
+        total_de = 0.0
+        total_dm = 0.0
+        for sites, fields in self._color_class_fields():
+            spins = 2.0 * configs - 1.0
+            s_i = spins[..., sites]
+            delta_e = -2.0 * s_i * (fields(spins) + self.mu[sites])
+            accept = rng.random(delta_e.shape) <= np.exp(-np.maximum(delta_e, 0.0) / T)
+            configs[..., sites] = np.where(accept, 1 - configs[..., sites], configs[..., sites])
+            total_de = total_de + np.sum(delta_e * accept, axis=-1)
+            total_dm = total_dm - 2.0 * np.sum(s_i * accept, axis=-1)
+        if state is not None:
+            state.update(total_de, total_dm)
+            state.end_sweep()
+        return configs
+
+    def compute_average_values(self, conf, T, chunk_size=2**14, method="chunked"):
         """
         Computes the average energy, magnetization, specific heat, and magnetic susceptibility of the Ising model at the given temperature.
 
+        All 2**N states are enumerated exactly, chunk_size states at a time: each chunk of integer states is
+        decoded into a spin matrix with bit operations and its energies and magnetizations are computed with
+        array operations. The Boltzmann sums are accumulated with log-sum-exp, so they do not overflow at low T.
+        With method="gray" the states are instead walked in Gray-code order and each block of energies is
+        updated incrementally from the single spin that changed, which costs O(degree) rather than O(edges).
+
         Parameters:
-        conf (IsingConfig): The spin configuration for which the average values need to be calculated.
+        conf (IsingConfig): A spin configuration of the system, used for its number of spins.
         T (float): The temperature at which the average values need to be calculated.
+        chunk_size (int): The number of states handled at once, which bounds the memory used.
+        method (str): The enumeration order, "chunked" or "gray", or "transfer" for the transfer-matrix solution
+            of chains and ladders (see transfer_matrix_solve).
 
         Returns:
         tuple: A tuple containing the average energy, magnetization, specific heat, and magnetic susceptibility of the Ising model.
         """
-        E  = 0.0
-        M  = 0.0
-        Z  = 0.0
-        EE = 0.0
-        MM = 0.0
-
-        for i in range(conf.n_dim):
-            conf.set_int_config(i)
-            Ei = self.energy(conf)
-            Zi = np.exp(-Ei/T)
-            E += Ei*Zi
-            EE += Ei*Ei*Zi
-            Mi = np.sum(2*conf.config-1)
-            M += Mi*Zi
-            MM += Mi*Mi*Zi
-            Z += Zi
-        
-        E = E/Z
-        M = M/Z
-        EE = EE/Z
-        MM = MM/Z
-        
-        HC = (EE - E*E)/(T*T)
-        MS = (MM - M*M)/T
-        return E, M, HC, MS
+        if conf.N != self.N:
+            raise ValueError("The configuration's length does not match the Hamiltonian's dimension.")
+        if method == "transfer":
+            return tuple(float(x) for x in self.transfer_matrix_solve(T)[1:])
+
+        sums = _BoltzmannSums(T)
+        for E, M in _enumerate(self, method, chunk_size):
+            sums.add(E, M)
+        return sums.averages()
+
+    def density_of_states(self, method="gray", chunk_size=2**14, decimals=8):
+        """
+        Enumerates all states once and returns their energy/magnetization histogram g(E, M).
+
+        Parameters:
+        method (str): The enumeration order, "chunked" or "gray".
+        chunk_size (int): The number of states handled at once, which bounds the memory used.
+        decimals (int): The number of decimals energies are rounded to before binning.
+
+        Returns:
+        DensityOfStates: The histogram, which can be reweighted to any temperature.
+        """
+        return DensityOfStates.from_hamiltonian(self, method=method, chunk_size=chunk_size, decimals=decimals)
+
+    def compute_average_values_over(self, Ts, method="gray", chunk_size=2**14):
+        """
+        Computes the average energy, magnetization, specific heat, and magnetic susceptibility for an array of temperatures.
+
+        The states are enumerated only once; every temperature is a reweighting of the density of states.
+
+        Parameters:
+        Ts (array_like): The temperatures at which the average values need to be calculated.
+        method (str): The enumeration order, "chunked" or "gray", or "transfer" to use transfer_matrix_solve
+            for chains and ladders, without enumerating the states.
+        chunk_size (int): The number of states handled at once, which bounds the memory used.
+
+        Returns:
+        tuple: Arrays with the average energy, magnetization, specific heat, and magnetic susceptibility at each temperature.
+        """
+        if method == "transfer":
+            return self.transfer_matrix_solve(Ts)[1:]
+        return self.density_of_states(method=method, chunk_size=chunk_size).averages(np.asarray(Ts, dtype=float))
+
+    def strip_width(self, max_width=8):
+        """
+        Detects a chain or ladder structure of the couplings.
+
+        Cutting the sites, in index order, into consecutive slices of w sites, the model is a strip of width w if
+        every coupling is within a slice or between neighboring slices, with the last slice neighboring the first
+        for periodic boundaries. A ring has w = 1 and a ladder numbered rung by rung has w = 2.
+
+        Parameters:
+        max_width (int): The largest width tried.
+
+        Returns:
+        int or None: The smallest such w that divides N, or None if there is none up to max_width.
+        """
+        return _strip_width(self, max_width)
+
+    def transfer_matrix_solve(self, Ts, max_width=8):
+        """
+        Computes the partition function and the averages exactly with transfer matrices, for chains and ladders.
+
+        The Boltzmann weight of a strip of width w is a trace of N/w products of 2**w x 2**w transfer matrices,
+        whose entries also carry the first and second moments of the energy and magnetization, so the cost is
+        O(N/w 8**w) per temperature instead of O(2**N): N in the thousands is solved exactly in milliseconds.
+
+        Parameters:
+        Ts (float or array_like): The temperatures.
+        max_width (int): The largest strip width tried (see strip_width).
+
+        Returns:
+        tuple: Arrays with log Z, the average energy, magnetization, specific heat, and magnetic susceptibility at each temperature.
+        """
+        w = self.strip_width(max_width)
+        if w is None:
+            raise ValueError(f"The couplings are not a chain or ladder of width up to {max_width}.")
+        Ts = np.asarray(Ts, dtype=float)
+        log_z, E, M, EE, MM = _transfer_matrix_solve(self, np.atleast_1d(Ts), w)
+        results = (log_z, E, M, (EE - E * E) / Ts / Ts, (MM - M * M) / Ts)
+        return tuple(x.reshape(Ts.shape) for x in results)
+
+
+def _as_spins(configs, signed):
+    """
+    Converts 0/1 (or, if signed, -1/+1) configurations of any numeric type to -1/+1 floats, checking the values.
+    """
+    if signed:
+        valid = (configs == 1) | (configs == -1)
+        spins = configs.astype(float)
+    else:
+        valid = (configs == 0) | (configs == 1)
+        spins = 2.0 * configs - 1.0
+    if not np.all(valid):
+        raise ValueError("Spins must be all 0/1 or all -1/+1.")
+    return spins
+
+
+def _csr_matvec(indptr, indices, data, x):
+    """
+    Multiplies the CSR matrix (indptr, indices, data) with x along its last axis.
+    """
+    prod = x[..., indices] * data
+    # a trailing zero lets empty rows at the end of the matrix index into prod
+    prod = np.concatenate((prod, np.zeros(prod.shape[:-1] + (1,))), axis=-1)
+    out = np.add.reduceat(prod, indptr[:-1], axis=-1)
+    out[..., indptr[:-1] == indptr[1:]] = 0.0
+    return out
+
+
+def _csr_rows(indptr, indices, data, rows):
+    """
+    Returns the CSR arrays (indptr, indices, data) of the given rows of a CSR matrix.
+    """
+    counts = indptr[rows + 1] - indptr[rows]
+    sub_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(counts, out=sub_indptr[1:])
+    # position of every kept entry in the original arrays
+    take = np.repeat(indptr[rows] - sub_indptr[:-1], counts) + np.arange(sub_indptr[-1])
+    return sub_indptr, indices[take], data[take]
+
+
+def _couplings_to_csr(J):
+    """
+    Returns the CSR arrays (indptr, indices, data) of couplings given as a scipy.sparse matrix or as a list of
+    lists of (neighbor, J) tuples, raising a ValueError unless every bond is listed from both of its ends with
+    the same strength.
+    """
+    if hasattr(J, "tocsr"):
+        csr = J.tocsr()
+        csr.sort_indices()
+        indptr, indices, data = csr.indptr, csr.indices, csr.data
+    else:
+        indptr, indices, data = _lists_to_csr(J)
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    forward = np.lexsort((data, indices, rows))
+    backward = np.lexsort((data, rows, indices))
+    if not (np.array_equal(rows[forward], indices[backward]) and np.array_equal(indices[forward], rows[backward])
+            and np.allclose(data[forward], data[backward])):
+        raise ValueError("The couplings must be symmetric: list every bond from both of its ends with the same J.")
+    return indptr, indices, data
+
+
+def _lists_to_csr(J):
+    """
+    Returns the CSR arrays (indptr, indices, data) of couplings given as a list of lists of (neighbor, J) tuples.
+    """
+    counts = np.fromiter((len(row) for row in J), dtype=np.int64, count=len(J))
+    nnz = int(counts.sum())
+    indptr = np.zeros(len(J) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    indices = np.fromiter((node for row in J for node, _ in row), dtype=np.int64, count=nnz)
+    data = np.fromiter((j_val for row in J for _, j_val in row), dtype=float, count=nnz)
+    return indptr, indices, data
+
+
+def _edges_to_csr(N, i, j, w):
+    """
+    Returns the CSR arrays (indptr, indices, data) of the symmetric couplings given by the bonds (i, j, w).
+    """
+    # every bond is stored from both ends, self loops only once
+    loop = i == j
+    rows = np.concatenate((i, j[~loop]))
+    cols = np.concatenate((j, i[~loop]))
+    vals = np.concatenate((w, w[~loop]))
+    order = np.lexsort((cols, rows))
 
+    indptr = np.zeros(N + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=N), out=indptr[1:])
+    return indptr, cols[order], vals[order]
@@ -0,0 +1,69 @@
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # pragma: no cover
+    numba = None
+
+
+def _metropolis_kernel(indptr, indices, data, mu, spins, rand, T):
+    """
+    Runs one sequential Metropolis sweep over 0/1 spins stored in a uint8/int8 array, in place.
+
+    Parameters
+    ----------
+    indptr, indices, data : numpy.ndarray
+        The CSR coupling arrays of the Hamiltonian.
+    mu : numpy.ndarray
+        The external field on each site.
+    spins : numpy.ndarray
+        The 0/1 configuration, updated in place.
+    rand : numpy.ndarray
+        One uniform random number in [0, 1) per site.
+    T : float
+        The temperature.
+
+    Returns
+    -------
+    tuple of float
+        The total energy and magnetization changes of the accepted flips.
+    """
+    total_de = 0.0
+    total_dm = 0.0
+    for i in range(spins.shape[0]):
+        delta_si = 2.0
+        if spins[i] == 1:
+            delta_si = -2.0
+
+        field = mu[i]
+        for k in range(indptr[i], indptr[i + 1]):
+            field += data[k] * (2.0 * spins[indices[k]] - 1.0)
+        delta_e = delta_si * field
+
+        if delta_e <= 0.0 or rand[i] <= np.exp(-delta_e / T):
+            spins[i] = 1 - spins[i]
+            total_de += delta_e
+            total_dm += delta_si
+    return total_de, total_dm
+
+
+if numba is not None:
+    _metropolis_kernel_jit = numba.njit(cache=True)(_metropolis_kernel)
+else:  # pragma: no cover
+    _metropolis_kernel_jit = None
+
+
+def _numba_available():
+    """
+    Returns True if the compiled kernels can be used.
+    """
+    return _metropolis_kernel_jit is not None
+
+
+def _compiled_sweep(ham, spins, rand, T):
+    """
+    Runs the compiled Metropolis sweep of ham on the 0/1 spins, in place, and returns the energy and
+    magnetization changes.
+    """
+    return _metropolis_kernel_jit(ham.indptr, ham.indices, ham.data, np.asarray(ham.mu, dtype=float), spins, rand,
+                                  float(T))
@@ -0,0 +1,439 @@
+import numpy as np
+import functools
+
+from .ising_hamiltonian import IsingHamiltonian, _edges_to_csr
+
+
+class LatticeIsingHamiltonian(IsingHamiltonian):
+    """
+    An Ising Hamiltonian on a regular lattice whose neighbors are implicit in the site indices.
+
+    Instead of storing one entry per bond, the lattice keeps a stencil of bond types: an offset between the
+    coordinates of the two sites, a coupling strength and, for the honeycomb lattice, the sublattice parity of
+    the sites the bond starts from. Local fields are computed by shifting the whole spin array by each
+    offset, so the coupling structure takes O(1) memory and every sweep is a few array operations. The
+    checkerboard sweep gathers the fields of each color class from per-class neighbor tables, built from the
+    stencil the first time it runs. Sites are
+    numbered in row-major (C) order of their coordinates.
+
+    The CSR arrays (indptr, indices, data) of IsingHamiltonian are only built, once, if a method that needs
+    explicit neighbor lists (the Numba kernel, the cluster moves or Gray-code enumeration) asks for them.
+    The stencil is not stored by save() or to_shared_memory(), so load() and from_shared_memory() return a
+    plain IsingHamiltonian with the same couplings.
+
+    Attributes:
+    - shape (tuple of int): The number of sites along each lattice direction.
+    - periodic (bool): Whether the boundaries are periodic or open.
+    - bonds (list of tuples): The stencil, as (offset, J, parity) bond types; parity is None for bonds that
+      start from every site, or 0/1 for bonds that start only from sites whose coordinate sum has that parity.
+    - N (int): The number of spins.
+    - mu (numpy.ndarray): The external field strength for each spin.
+
+    Methods:
+    - __init__(self, shape, bonds, mu=0.0, periodic=True): Constructs a lattice from its stencil.
+    - load(path, mmap=True): Opens a lattice written by save() as a plain IsingHamiltonian.
+    - from_shared_memory(handle): Builds a plain IsingHamiltonian on a shared memory block.
+    - neighbors(self, i): Returns the neighbors of site i, computed from its coordinates.
+    - local_fields(self, spins): Computes the coupling field on every site with shifted copies of the spins.
+    - coloring(self): Returns the sublattice coloring, or a greedy coloring if the lattice has none.
+    """
+    _batch_energies_from_fields = True
+
+    def __init__(self, shape, bonds, mu=0.0, periodic=True):
+        """
+        Constructs a lattice Hamiltonian from its shape and stencil.
+
+        Parameters
+        ----------
+        shape : tuple of int
+            The number of sites along each lattice direction.
+        bonds : list of tuples
+            The bond types (offset, J, parity), each bond listed once, from the site it starts from.
+        mu : float or array_like, optional
+            The external field, uniform or one value per site (default is 0.0).
+        periodic : bool, optional
+            Whether the boundaries are periodic (default is True).
+        """
+        self.shape = tuple(int(L) for L in shape)
+        self.periodic = periodic
+        self.bonds = [(tuple(int(d) for d in offset), float(J), parity) for offset, J, parity in bonds]
+        if periodic and min(self.shape) < 3:
+            raise ValueError("Periodic lattices need at least 3 sites along every direction.")
+
+        self.N = int(np.prod(self.shape))
+        self.mu = np.broadcast_to(np.asarray(mu, dtype=float), (self.N,)).copy()
+        self._diag_sum = 0.0
+        self._csr = None
+
+        self._shape_array = np.array(self.shape, dtype=np.int64)
+        # row-major strides, so that the index of a site is its coordinates @ _strides
+        self._strides = np.cumprod((self.shape[1:] + (1,))[::-1])[::-1].astype(np.int64)
+        self._stencil = {parity: self._parity_stencil(parity) for parity in (0, 1)}
+
+    def _parity_stencil(self, parity):
+        """
+        Returns the offsets to the neighbors of a site whose coordinate sum has the given parity, and the
+        matching couplings, in the order neighbors() lists them.
+        """
+        offsets, js = [], []
+        for offset, J, bond_parity in self.bonds:
+            # the bond leaves the site forward, or arrives at it from the site one offset back
+            for sign in (1, -1):
+                start_parity = parity if sign == 1 else (parity - sum(offset)) % 2
+                if bond_parity is not None and start_parity != bond_parity:
+                    continue
+                offsets.append([sign * d for d in offset])
+                js.append(J)
+        return np.array(offsets, dtype=np.int64).reshape(-1, len(self.shape)), np.array(js, dtype=float)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Opens a lattice written by save() as a plain IsingHamiltonian, since the file holds no stencil.
+
+        Parameters
+        ----------
+        path : str or os.PathLike
+            The file to read.
+        mmap : bool, optional
+            Whether to memory-map the arrays rather than read them into memory (default is True).
+
+        Returns
+        -------
+        IsingHamiltonian
+            The Hamiltonian with the lattice's couplings, as explicit neighbor lists.
+        """
+        return IsingHamiltonian.load(path, mmap)
+
+    @classmethod
+    def from_shared_memory(cls, handle):
+        """
+        Builds a plain IsingHamiltonian on a shared memory block, since the block holds no stencil.
+
+        Parameters
+        ----------
+        handle : SharedHamiltonian
+            The handle returned by to_shared_memory.
+
+        Returns
+        -------
+        IsingHamiltonian
+            The Hamiltonian with the lattice's couplings, as explicit neighbor lists.
+        """
+        return IsingHamiltonian.from_shared_memory(handle)
+
+    def __repr__(self):
+        """
+        Returns a string representation of the lattice.
+        """
+        boundary = "periodic" if self.periodic else "open"
+        return f"LatticeIsingHamiltonian(shape={self.shape}, {len(self.bonds)} bond types, {boundary})"
+
+    # the couplings follow from the stencil, so J is read-only, like the CSR arrays
+    J = property(IsingHamiltonian.J.fget)
+
+    @property
+    def indptr(self):
+        """
+        The CSR row pointers of the couplings, built on first access.
+        """
+        return self._materialize()[0]
+
+    @property
+    def indices(self):
+        """
+        The CSR neighbor indices of the couplings, built on first access.
+        """
+        return self._materialize()[1]
+
+    @property
+    def data(self):
+        """
+        The CSR coupling strengths, built on first access.
+        """
+        return self._materialize()[2]
+
+    def _materialize(self):
+        """
+        Builds (once) and returns the explicit CSR arrays of the lattice couplings.
+        """
+        if self._csr is None:
+            coords = np.indices(self.shape).reshape(len(self.shape), -1)
+            i, j, w = [], [], []
+            for offset, J, parity in self.bonds:
+                target = coords + np.array(offset)[:, None]
+                keep = np.ones(self.N, dtype=bool)
+                if parity is not None:
+                    keep &= coords.sum(axis=0) % 2 == parity
+                if self.periodic:
+                    target %= np.array(self.shape)[:, None]
+                else:
+                    keep &= np.all((target >= 0) & (target < np.array(self.shape)[:, None]), axis=0)
+                i.append(np.flatnonzero(keep))
+                j.append(np.ravel_multi_index(target[:, keep], self.shape))
+                w.append(np.full(keep.sum(), J))
+            indptr, indices, data = _edges_to_csr(self.N, np.concatenate(i), np.concatenate(j), np.concatenate(w))
+            index_dtype = np.int32 if self.N < 2**31 else np.int64
+            self._csr = (indptr, indices.astype(index_dtype), data.astype(float))
+        return self._csr
+
+    def neighbors(self, i):
+        """
+        Returns the neighbors of site i and the matching coupling strengths, computed from its coordinates.
+
+        Parameters
+        ----------
+        i : int
+            The index of the site.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            The neighbor indices and the coupling strengths.
+        """
+        coords = (i // self._strides) % self._shape_array
+        parity = int(coords.sum()) % 2
+        nodes, inside = self._stencil_targets(coords[None, :], parity)
+        return nodes[0][inside[0]], self._stencil[parity][1][inside[0]]
+
+    def _site_couplings(self, max_degree):
+        """
+        Returns the degree of every site and its sorted couplings, zero-padded, from the stencil rather than CSR.
+        """
+        k = max(len(self._stencil[p][1]) for p in (0, 1))
+        if self.N == 0 or k > max_degree:
+            return None
+        coords = np.indices(self.shape).reshape(len(self.shape), -1).T
+        parity = coords.sum(axis=1) % 2
+        degree = np.zeros(self.N, dtype=np.int64)
+        js = np.zeros((self.N, k))
+        for p in (0, 1):
+            sites = np.flatnonzero(parity == p)
+            _, inside = self._stencil_targets(coords[sites], p)
+            # bonds leaving an open lattice sort last and are dropped
+            rows = np.sort(np.where(inside, self._stencil[p][1], np.inf), axis=1)
+            degree[sites] = inside.sum(axis=1)
+            js[sites, :rows.shape[1]] = np.where(np.isinf(rows), 0.0, rows)
+        return degree, js
+
+    def _stencil_targets(self, coords, parity):
+        """
+        Returns the (n_sites, k) neighbor indices of the sites with coordinates coords (n_sites, d), all of the
+        given parity, and a mask of the neighbors that lie inside the lattice.
+        """
+        targets = coords[:, None, :] + self._stencil[parity][0]
+        if self.periodic:
+            targets %= self._shape_array
+            inside = np.ones(targets.shape[:2], dtype=bool)
+        else:
+            inside = np.all((targets >= 0) & (targets < self._shape_array), axis=-1)
+            targets = np.where(inside[..., None], targets, 0)
+        return targets @ self._strides, inside
+
+    def local_fields(self, spins):
+        """
+        Computes the coupling field h_i = sum_j J_ij s_j on every site from shifted copies of the spins.
+
+        Parameters
+        ----------
+        spins : numpy.ndarray
+            Spins in the -1/+1 convention, of shape (N,) or (n_configs, N).
+
+        Returns
+        -------
+        numpy.ndarray
+            The local fields, with the same shape as spins.
+        """
+        lead = spins.shape[:-1]
+        grid = spins.reshape(lead + self.shape)
+        fields = np.zeros_like(grid, dtype=float)
+        for offset, J, parity in self.bonds:
+            if parity is None:
+                fields += J * self._shift(grid, offset)
+                fields += J * self._shift(grid, tuple(-d for d in offset))
+            else:
+                starts = self._parity_mask() == parity
+                fields += J * np.where(starts, self._shift(grid, offset), 0.0)
+                fields += J * self._shift(np.where(starts, grid, 0.0), tuple(-d for d in offset))
+        return fields.reshape(spins.shape)
+
+    def _entries_per_config(self):
+        """
+        Returns the size of the temporary arrays local_fields allocates per configuration, without building CSR.
+        """
+        return 3 * self.N
+
+    def _shift(self, grid, offset):
+        """
+        Returns out with out[x] = grid[x + offset] over the lattice axes, zero outside open boundaries.
+        """
+        n_lead = grid.ndim - len(self.shape)
+        if self.periodic:
+            axes = tuple(range(n_lead, grid.ndim))
+            return np.roll(grid, tuple(-d for d in offset), axis=axes)
+        out = np.zeros_like(grid, dtype=float)
+        src = [slice(None)] * n_lead
+        dst = [slice(None)] * n_lead
+        for d, L in zip(offset, self.shape):
+            if d >= 0:
+                src.append(slice(d, L))
+                dst.append(slice(0, L - d))
+            else:
+                src.append(slice(0, L + d))
+                dst.append(slice(-d, L))
+        out[tuple(dst)] = grid[tuple(src)]
+        return out
+
+    def _parity_mask(self):
+        """
+        Returns the parity of the coordinate sum of every site, as an array of the lattice shape.
+        """
+        return sum(np.indices(self.shape)) % 2
+
+    def coloring(self):
+        """
+        Colors the lattice so that no two coupled sites share a color.
+
+        Bipartite lattices use the parity of the coordinate sum and the triangular lattice uses
+        (x + 2y) mod 3, computed from the coordinates without building neighbor lists. When the periodic
+        boundaries break that pattern (e.g. an odd side), the greedy coloring of IsingHamiltonian is used.
+
+        Returns
+        -------
+        numpy.ndarray
+            The color of each site, numbered from 0.
+        """
+        if getattr(self, "_colors", None) is None:
+            coords = np.indices(self.shape).reshape(len(self.shape), -1)
+            offsets = np.array([offset for offset, _, _ in self.bonds]).T
+            n_colors = 2 if np.all(offsets.sum(axis=0) % 2 == 1) else 3
+            weights = np.ones(len(self.shape), dtype=np.int64)
+            if n_colors == 3:
+                weights[1:] = 2
+            colors = (weights @ coords) % n_colors
+            wraps = self.periodic and any(L * w % n_colors for L, w in zip(self.shape, weights))
+            if wraps or np.any((weights @ offsets) % n_colors == 0):
+                return IsingHamiltonian.coloring(self)
+            self._colors = colors
+            self._color_classes = None
+        return self._colors
+
+    def _color_class_fields(self):
+        """
+        Returns, for each color, its sites and a function computing the local fields on those sites by stencil.
+        """
+        if getattr(self, "_color_classes", None) is None:
+            colors = self.coloring()
+            self._color_classes = []
+            for color in range(colors.max() + 1):
+                sites = np.flatnonzero(colors == color)
+                self._color_classes.append((sites, functools.partial(self._fields_at, self._class_stencil(sites))))
+        return self._color_classes
+
+    def _class_stencil(self, sites):
+        """
+        Returns the neighbor tables of a color class: for each parity present, the positions of its sites in
+        the class, their (n_sites, k) neighbor indices and the k couplings. Neighbors outside an open lattice
+        point to index N, which _fields_at pads with a zero spin.
+        """
+        coords = (sites[:, None] // self._strides) % self._shape_array
+        parity = coords.sum(axis=1) % 2
+        index_dtype = np.int32 if self.N < 2**31 - 1 else np.int64
+        groups = []
+        for p in (0, 1):
+            group = np.flatnonzero(parity == p)
+            if len(group) == 0:
+                continue
+            nodes, inside = self._stencil_targets(coords[group], p)
+            nodes = np.where(inside, nodes, self.N).astype(index_dtype)
+            groups.append((slice(None) if len(group) == len(sites) else group, nodes, self._stencil[p][1]))
+        return len(sites), groups
+
+    def _fields_at(self, class_stencil, spins):
+        """
+        Returns the local fields on the sites of a color class, gathered from their neighbors only.
+        """
+        n_sites, groups = class_stencil
+        if not self.periodic:
+            spins = np.concatenate((spins, np.zeros(spins.shape[:-1] + (1,))), axis=-1)
+        fields = np.empty(spins.shape[:-1] + (n_sites,))
+        for group, nodes, js in groups:
+            fields[..., group] = spins[..., nodes] @ js
+        return fields
+
+def hypercubic_lattice(shape, J=1.0, mu=0.0, periodic=True):
+    """
+    Builds a chain, square or cubic (any dimension) lattice with nearest-neighbor couplings.
+
+    Parameters
+    ----------
+    shape : int or tuple of int
+        The number of sites along each direction; an int gives a chain.
+    J : float, optional
+        The coupling strength; with E = sum J s_i s_j, J < 0 is ferromagnetic (default is 1.0).
+    mu : float or array_like, optional
+        The external field (default is 0.0).
+    periodic : bool, optional
+        Whether the boundaries are periodic (default is True).
+
+    Returns
+    -------
+    LatticeIsingHamiltonian
+        The lattice Hamiltonian.
+    """
+    shape = (shape,) if np.isscalar(shape) else tuple(shape)
+    bonds = [(tuple(int(k == axis) for k in range(len(shape))), J, None) for axis in range(len(shape))]
+    return LatticeIsingHamiltonian(shape, bonds, mu=mu, periodic=periodic)
+
+
+def triangular_lattice(Lx, Ly, J=1.0, mu=0.0, periodic=True):
+    """
+    Builds a triangular lattice, as a square grid with one extra diagonal bond, so every site has six neighbors.
+
+    Parameters
+    ----------
+    Lx, Ly : int
+        The number of sites along the two lattice directions.
+    J : float, optional
+        The coupling strength (default is 1.0).
+    mu : float or array_like, optional
+        The external field (default is 0.0).
+    periodic : bool, optional
+        Whether the boundaries are periodic (default is True).
+
+    Returns
+    -------
+    LatticeIsingHamiltonian
+        The lattice Hamiltonian.
+    """
+    bonds = [((1, 0), J, None), ((0, 1), J, None), ((-1, 1), J, None)]
+    return LatticeIsingHamiltonian((Lx, Ly), bonds, mu=mu, periodic=periodic)
+
+
+def honeycomb_lattice(Lx, Ly, J=1.0, mu=0.0, periodic=True):
+    """
+    Builds a honeycomb lattice in its brick-wall form, so every site has three neighbors.
+
+    All sites are bonded along x, and sites with even x + y are also bonded to the site above them.
+    Periodic boundaries need even Lx and Ly.
+
+    Parameters
+    ----------
+    Lx, Ly : int
+        The number of sites along the two grid directions.
+    J : float, optional
+        The coupling strength (default is 1.0).
+    mu : float or array_like, optional
+        The external field (default is 0.0).
+    periodic : bool, optional
+        Whether the boundaries are periodic (default is True).
+
+    Returns
+    -------
+    LatticeIsingHamiltonian
+        The lattice Hamiltonian.
+    """
+    if periodic and (Lx % 2 or Ly % 2):
+        raise ValueError("A periodic honeycomb lattice needs even Lx and Ly.")
+    bonds = [((1, 0), J, None), ((0, 1), J, 0)]
+    return LatticeIsingHamiltonian((Lx, Ly), bonds, mu=mu, periodic=periodic)
@@ -1,6 +1,14 @@
 import numpy as np
 
-def metropolis_monte_carlo(ham, conf, T=1, nsweep=1000, nburn=100):
+from .random_streams import _as_generator, _generator_state, _restore_generator
+from .cluster import CLUSTER_MOVES
+from .sampler_state import SamplerState
+from .accumulators import WelfordAccumulator
+from .bitstring import BitString
+from .checkpoint import save_checkpoint, load_checkpoint, _history_path, _append_rows, _read_rows
+
+def metropolis_monte_carlo(ham, conf, T=1, nsweep=1000, nburn=100, method="sequential", rng=None,
+                           refresh_interval=1000, checkpoint=None, checkpoint_interval=1000, local_fields=False):
     """
     Perform Metropolis Monte Carlo simulation to obtain thermodynamic properties of a given system.
 
@@ -16,6 +24,27 @@ def metropolis_monte_carlo(ham, conf, T=1, nsweep=1000, nburn=100):
         The total number of Monte Carlo sweeps to be performed. Default is 1000.
     nburn : int, optional
         The number of sweeps used for thermalization of the system. Default is 100.
+    method : str, optional
+        The move type: a ham.metropolis_sweep method ("sequential", "numba" or "checkerboard") or a cluster
+        move ("wolff" or "swendsen-wang"). Default is "sequential".
+    rng : numpy.random.Generator, numpy.random.SeedSequence or int, optional
+        The generator (or seed) the sweeps draw from. By default the sequential sweep draws from the random module
+        as it always has, and the other move types use a generator seeded from the random module.
+    refresh_interval : int, optional
+        E and M are tracked incrementally from the accepted flips and recomputed from scratch every
+        refresh_interval sweeps to guard against floating-point drift. Default is 1000.
+    checkpoint : str or os.PathLike, optional
+        If given, the state of the run (configuration, tracked E and M, sweep index and random number
+        generator states) is saved to this .npz file every checkpoint_interval measured sweeps and at the
+        end, so that resume_monte_carlo can continue the run after an interruption. The running means of the
+        sweeps since the previous checkpoint are appended to the file checkpoint + ".history", so each
+        checkpoint writes O(checkpoint_interval) data however long the run. Default is None.
+    checkpoint_interval : int, optional
+        The number of measured sweeps between checkpoints. Default is 1000.
+    local_fields : bool, optional
+        Track the coupling field of every site, so that the sequential sweep computes each energy change in
+        O(1) and pays O(degree) only for accepted flips. Worth it for dense or high-degree graphs, especially
+        at low T. Default is False.
 
     Returns:
     --------
@@ -28,32 +57,287 @@ def metropolis_monte_carlo(ham, conf, T=1, nsweep=1000, nburn=100):
     MM_samples : numpy.ndarray
         Array of length nsweep containing the squared magnetization samples obtained during the simulation.
     """
-    E_samples = np.zeros(nsweep)
-    M_samples = np.zeros(nsweep)
-    EE_samples = np.zeros(nsweep)
-    MM_samples = np.zeros(nsweep)
+    if method != "sequential" or rng is not None:
+        rng = _as_generator(rng)
 
-    # thermalization
-    for _ in range(nburn):
-        ham.metropolis_sweep(conf, T=T)
+    state = _thermalize(ham, conf, T, nburn, method, rng, refresh_interval, local_fields)
+    run = {"T": T, "nsweep": nsweep, "method": method, "rng": rng, "state": state,
+           "samples": np.zeros((4, nsweep)), "start": 0}
+    return _accumulate(ham, conf, run, checkpoint, checkpoint_interval)
 
-    # accumulation
-    E_samples[0] = ham.energy(conf)
-    M_samples[0] = conf.get_magnetization()
-    MM_samples[0] = M_samples[0] ** 2
-    EE_samples[0] = E_samples[0] ** 2
 
-    for si in range(1, nsweep):
-        ham.metropolis_sweep(conf, T=T)
-        Ei = ham.energy(conf)
-        Mi = conf.get_magnetization()
+def resume_monte_carlo(ham, checkpoint, checkpoint_interval=1000, conf=None):
+    """
+    Continue a metropolis_monte_carlo run from its last checkpoint.
 
-        # update energy and magnetization means
-        E_samples[si] = E_samples[si-1] + (Ei - E_samples[si-1]) / (si+1)
-        M_samples[si] = M_samples[si-1] + (Mi - M_samples[si-1]) / (si+1)
+    The configuration, running means, sweep index and random number generator states (including the global
+    random module used by the sequential sweep) are restored, so the results are identical to those of an
+    uninterrupted run. The run keeps checkpointing to the same file; history rows appended after the last
+    checkpoint are discarded.
 
-        # update energy and magnetization squared means
-        EE_samples[si] = EE_samples[si-1] + (Ei ** 2 - EE_samples[si-1]) / (si+1)
-        MM_samples[si] = MM_samples[si-1] + (Mi ** 2 - MM_samples[si-1]) / (si+1)
+    Parameters:
+    -----------
+    ham : object
+        The Hamiltonian the run was started with.
+    checkpoint : str or os.PathLike
+        The checkpoint file written by metropolis_monte_carlo.
+    checkpoint_interval : int, optional
+        The number of measured sweeps between further checkpoints. Default is 1000.
+    conf : object, optional
+        A Configuration of length N that is set to the checkpointed configuration and advanced in place, so
+        that the final configuration of the run can be inspected or sampled further. Default is None.
+
+    Returns:
+    --------
+    E_samples, M_samples, EE_samples, MM_samples : numpy.ndarray
+        The running means of the whole run, as returned by metropolis_monte_carlo.
+    """
+    data = load_checkpoint(checkpoint)
+    restored = BitString.from_packed(data["config"], data["N"])
+    if conf is None:
+        conf = restored
+    elif conf.N != restored.N:
+        raise ValueError("The configuration's length does not match the checkpoint's.")
+    else:
+        conf.set_config(restored.config, copy=False)
+    state = SamplerState.__new__(SamplerState)
+    state.ham, state.conf, state.n_sweeps = ham, conf, data["n_sweeps"]
+    state.refresh_interval = data["refresh_interval"] if data["refresh_interval"] > 0 else None
+    state.E, state.M = data["E"], data["M"]
+    state.local_fields = bool(data.get("local_fields", False))
+    state._fields = data["fields"] if state.local_fields and data["fields"].size else None
+
+    samples = np.zeros((4, data["nsweep"]))
+    samples[:, :data["start"]] = _read_rows(_history_path(checkpoint), data["start"], 4).T
+    _restore_generator(data["random_state"])
+    rng = _restore_generator(data["rng_state"]) if data["rng_state"] else None
+    run = {"T": data["T"], "nsweep": data["nsweep"], "method": data["method"], "rng": rng, "state": state,
+           "samples": samples, "start": data["start"]}
+    return _accumulate(ham, conf, run, checkpoint, checkpoint_interval)
+
+
+def _accumulate(ham, conf, run, checkpoint, checkpoint_interval):
+    """
+    Runs the measured sweeps of a run from run["start"], updating the running means and checkpointing.
+    """
+    T, method, rng, state, samples = run["T"], run["method"], run["rng"], run["state"], run["samples"]
+    E_samples, M_samples, EE_samples, MM_samples = samples
+    # the history file holds the running means up to the last checkpoint; each checkpoint appends its block
+    saved = run["start"]
+    if checkpoint is not None and saved == 0:
+        open(_history_path(checkpoint), "wb").close()
+
+    for si in range(run["start"], run["nsweep"]):
+        if si > 0:
+            _sweep(ham, conf, T, method, rng, state)
+        Ei, Mi = state.E, state.M
+        if si == 0:
+            E_samples[0] = Ei
+            M_samples[0] = Mi
+            MM_samples[0] = Mi ** 2
+            EE_samples[0] = Ei ** 2
+        else:
+            # update energy and magnetization means
+            E_samples[si] = E_samples[si-1] + (Ei - E_samples[si-1]) / (si+1)
+            M_samples[si] = M_samples[si-1] + (Mi - M_samples[si-1]) / (si+1)
+
+            # update energy and magnetization squared means
+            EE_samples[si] = EE_samples[si-1] + (Ei ** 2 - EE_samples[si-1]) / (si+1)
+            MM_samples[si] = MM_samples[si-1] + (Mi ** 2 - MM_samples[si-1]) / (si+1)
+
+        if checkpoint is not None and ((si + 1) % checkpoint_interval == 0 or si + 1 == run["nsweep"]):
+            # the block is on disk before the checkpoint that refers to it
+            _append_rows(_history_path(checkpoint), samples[:, saved:si + 1].T)
+            saved = si + 1
+            save_checkpoint(checkpoint, config=conf.packed(), N=conf.N, T=T, nsweep=run["nsweep"], method=method,
+                            start=si + 1, E=state.E, M=state.M,
+                            n_sweeps=state.n_sweeps, refresh_interval=state.refresh_interval or 0,
+                            local_fields=state.local_fields,
+                            fields=state._fields if state._fields is not None else np.zeros(0),
+                            random_state=_generator_state(None),
+                            rng_state=_generator_state(rng) if rng is not None else "")
 
     return E_samples, M_samples, EE_samples, MM_samples
+
+
+def metropolis_samples(ham, conf, T=1, nsweep=1000, nburn=100, method="sequential", rng=None, refresh_interval=1000,
+                       thin=1, local_fields=False):
+    """
+    Generate the energy and magnetization of a Monte Carlo run one sample at a time.
+
+    The configuration is thermalized for nburn sweeps; then (E, M) is yielded for the current state and after
+    every thin-th of the following nsweep-1 sweeps. Nothing is stored, so memory is O(1) in nsweep.
+
+    Parameters:
+    -----------
+    ham : object
+        An instance of a Hamiltonian class representing the system being studied.
+    conf : object
+        An instance of a Configuration class representing the initial configuration of the system.
+    T : float, optional
+        Temperature of the system in units of energy. Default is 1.
+    nsweep : int, optional
+        The total number of Monte Carlo sweeps to be performed. Default is 1000.
+    nburn : int, optional
+        The number of sweeps used for thermalization of the system. Default is 100.
+    method : str, optional
+        The move type, as in metropolis_monte_carlo. Default is "sequential".
+    rng : numpy.random.Generator, numpy.random.SeedSequence or int, optional
+        The generator (or seed) the sweeps draw from. By default the sequential sweep draws from the random module
+        as it always has, and the other move types use a generator seeded from the random module.
+    refresh_interval : int, optional
+        The number of sweeps between full recomputations of the incrementally tracked E and M. Default is 1000.
+    thin : int, optional
+        Yield a sample only every thin sweeps. Default is 1.
+    local_fields : bool, optional
+        Track the coupling field of every site, as in metropolis_monte_carlo. Default is False.
+
+    Yields:
+    -------
+    tuple of float
+        The energy and magnetization of the sample.
+    """
+    if method != "sequential" or rng is not None:
+        rng = _as_generator(rng)
+
+    # accumulation
+    state = _thermalize(ham, conf, T, nburn, method, rng, refresh_interval, local_fields)
+    yield state.E, state.M
+    for si in range(1, nsweep):
+        _sweep(ham, conf, T, method, rng, state)
+        if si % thin == 0:
+            yield state.E, state.M
+
+
+def stream_monte_carlo(ham, conf, T=1, nsweep=1000, nburn=100, accumulators=None, method="sequential", rng=None,
+                       refresh_interval=1000, thin=1, local_fields=False):
+    """
+    Perform a Monte Carlo simulation feeding every sample to accumulators instead of storing it.
+
+    Memory is O(1) in nsweep unless one of the accumulators records the samples (see TraceAccumulator).
+
+    Parameters:
+    -----------
+    ham : object
+        An instance of a Hamiltonian class representing the system being studied.
+    conf : object
+        An instance of a Configuration class representing the initial configuration of the system.
+    T : float, optional
+        Temperature of the system in units of energy. Default is 1.
+    nsweep : int, optional
+        The total number of Monte Carlo sweeps to be performed. Default is 1000.
+    nburn : int, optional
+        The number of sweeps used for thermalization of the system. Default is 100.
+    accumulators : list, optional
+        Objects with an add(E, M) method, such as WelfordAccumulator, HistogramAccumulator,
+        BinningAccumulator or TraceAccumulator. Default is a single WelfordAccumulator.
+    method : str, optional
+        The move type, as in metropolis_monte_carlo. Default is "sequential".
+    rng : numpy.random.Generator, numpy.random.SeedSequence or int, optional
+        The generator (or seed) the sweeps draw from. By default the sequential sweep draws from the random module
+        as it always has, and the other move types use a generator seeded from the random module.
+    refresh_interval : int, optional
+        The number of sweeps between full recomputations of the incrementally tracked E and M. Default is 1000.
+    thin : int, optional
+        Feed only every thin-th sweep to the accumulators. Default is 1.
+    local_fields : bool, optional
+        Track the coupling field of every site, as in metropolis_monte_carlo. Default is False.
+
+    Returns:
+    --------
+    accumulators : list
+        The accumulators, after all samples have been added.
+    """
+    if accumulators is None:
+        accumulators = [WelfordAccumulator()]
+    for Ei, Mi in metropolis_samples(ham, conf, T, nsweep, nburn, method, rng, refresh_interval, thin, local_fields):
+        for accumulator in accumulators:
+            accumulator.add(Ei, Mi)
+    return accumulators
+
+
+def _thermalize(ham, conf, T, nburn, method, rng, refresh_interval, local_fields):
+    """
+    Runs the nburn thermalization sweeps and returns a fresh SamplerState for the measured sweeps.
+
+    With local_fields the thermalization sweeps use the fields as well; otherwise they track nothing.
+    """
+    state = SamplerState(ham, conf, refresh_interval, local_fields=True) if local_fields else None
+    for _ in range(nburn):
+        _sweep(ham, conf, T, method, rng, state)
+    return SamplerState(ham, conf, refresh_interval=refresh_interval, local_fields=local_fields)
+
+
+def _sweep(ham, conf, T, method, rng, state=None):
+    """
+    Advances conf by one sweep of the given method, either a cluster move or a ham.metropolis_sweep method.
+    """
+    if method in CLUSTER_MOVES:
+        return CLUSTER_MOVES[method](ham, conf, T=T, rng=rng, state=state)
+    return ham.metropolis_sweep(conf, T=T, method=method, rng=rng, state=state)
+
+
+def metropolis_monte_carlo_batch(ham, confs, T=1, nsweep=1000, nburn=100, rng=None, refresh_interval=1000):
+    """
+    Perform Metropolis Monte Carlo simulation of many independent chains at once.
+
+    The chains are stored as one (n_chains, N) array and every sweep advances all of them together with
+    ham.batch_metropolis_sweep, so the cost scales with the array size rather than with a loop over chains.
+
+    Parameters:
+    -----------
+    ham : object
+        An instance of a Hamiltonian class representing the system being studied.
+    confs : int or numpy.ndarray
+        Either the number of chains, started from random configurations, or an (n_chains, N) array of 0/1
+        initial configurations, which is updated in place.
+    T : float, optional
+        Temperature of the system in units of energy. Default is 1.
+    nsweep : int, optional
+        The total number of Monte Carlo sweeps to be performed. Default is 1000.
+    nburn : int, optional
+        The number of sweeps used for thermalization of the system. Default is 100.
+    rng : numpy.random.Generator or int, optional
+        The generator (or seed) for the chains. By default it is seeded from the random module.
+    refresh_interval : int, optional
+        The number of sweeps between full recomputations of the incrementally tracked E and M. Default is 1000.
+
+    Returns:
+    --------
+    results : dict
+        "E", "M", "EE", "MM", "HC" and "MS" hold the per-chain averages (arrays of length n_chains) of the
+        energy, magnetization, their squares, the heat capacity and the magnetic susceptibility. "mean" and
+        "stderr" map the same names to the pooled mean over chains and its standard error.
+    """
+    rng = _as_generator(rng)
+    if np.isscalar(confs):
+        confs = rng.integers(0, 2, size=(confs, ham.N), dtype=np.uint8)
+    n_chains = confs.shape[0]
+
+    # thermalization
+    for _ in range(nburn):
+        ham.batch_metropolis_sweep(confs, T=T, rng=rng)
+
+    # accumulation
+    state = SamplerState(ham, confs, refresh_interval=refresh_interval)
+    sums = {name: np.zeros(n_chains) for name in ("E", "M", "EE", "MM")}
+    for si in range(nsweep):
+        if si > 0:
+            ham.batch_metropolis_sweep(confs, T=T, rng=rng, state=state)
+        Ei = state.E
+        Mi = state.M
+        sums["E"] += Ei
+        sums["M"] += Mi
+        sums["EE"] += Ei ** 2
+        sums["MM"] += Mi ** 2
+
+    results = {name: total / nsweep for name, total in sums.items()}
+    results["HC"] = (results["EE"] - results["E"] ** 2) / T / T
+    results["MS"] = (results["MM"] - results["M"] ** 2) / T
+
+    results["mean"] = {}
+    results["stderr"] = {}
+    for name in ("E", "M", "EE", "MM", "HC", "MS"):
+        results["mean"][name] = np.mean(results[name])
+        results["stderr"][name] = np.std(results[name], ddof=1) / np.sqrt(n_chains) if n_chains > 1 else np.nan
+    return results
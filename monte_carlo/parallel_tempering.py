@@ -0,0 +1,155 @@
+import numpy as np
+import concurrent.futures
+
+from .bitstring import BitString
+from .random_streams import _as_generator
+from .metropolis_monte_carlo import _sweep
+from .sampler_state import SamplerState
+from .shared import _init_worker, _worker_hamiltonian
+
+
+def parallel_tempering(ham, Ts, nsweep=1000, nburn=100, swap_interval=1, method="sequential", n_workers=None,
+                       rng=None, confs=None):
+    """
+    Perform replica-exchange (parallel tempering) Monte Carlo over a ladder of temperatures.
+
+    One replica is sampled at each temperature with ham.metropolis_sweep (or a cluster move). Every swap_interval sweeps,
+    configurations at neighboring temperatures are exchanged with probability
+    min(1, exp((1/T_k - 1/T_k+1) * (E_k - E_k+1))), alternating between the even and the odd pairs.
+
+    Parameters:
+    -----------
+    ham : object
+        An instance of a Hamiltonian class representing the system being studied.
+    Ts : array_like
+        The temperature ladder, in increasing order.
+    nsweep : int, optional
+        The number of measured sweeps per replica. Default is 1000.
+    nburn : int, optional
+        The number of thermalization sweeps per replica, during which swaps are already attempted. Default is 100.
+    swap_interval : int, optional
+        The number of sweeps between swap attempts. Default is 1.
+    method : str, optional
+        The move type, as in metropolis_monte_carlo. Default is "sequential".
+    n_workers : int, optional
+        If given, the replicas are advanced in a process pool of this size. The Hamiltonian is sent to each
+        worker once, when it starts, and the configurations travel at every swap attempt, so a larger
+        swap_interval amortizes the communication. Default is None (serial).
+    rng : numpy.random.Generator, numpy.random.SeedSequence or int, optional
+        The generator (or seed) for the swaps, the sweeps and the worker seeds. By default it is seeded from
+        the random module.
+    confs : list of BitString, optional
+        The initial configuration at each temperature. Default is all spins down.
+
+    Returns:
+    --------
+    results : dict
+        "T", "E", "M", "EE", "MM", "HC" and "MS" hold the per-temperature averages. "swap_acceptance" holds
+        the acceptance rate of the swaps between temperatures k and k+1, "round_trips" the number of
+        completed round trips (lowest to highest temperature and back) and "round_trip_time" their mean
+        duration in sweeps. "confs" holds the final configuration at each temperature.
+    """
+    Ts = np.asarray(Ts, dtype=float)
+    n_temps = len(Ts)
+    rng = _as_generator(rng)
+    if confs is None:
+        confs = [BitString(N=ham.N) for _ in range(n_temps)]
+    configs = [np.array(conf.config) for conf in confs]
+    energies = ham.energy_batch(np.array(configs))
+
+    sums = np.zeros((n_temps, 4))
+    swaps_tried = np.zeros(n_temps - 1)
+    swaps_accepted = np.zeros(n_temps - 1)
+
+    # replica_at[k] is the label of the replica at temperature k; round trips start at the lowest temperature
+    replica_at = np.arange(n_temps)
+    last_end = np.full(n_temps, -1)
+    last_end[replica_at[0]] = 0
+    trip_start = np.zeros(n_temps)
+    trip_times = []
+
+    executor = None
+    if n_workers is not None:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                                          initargs=(ham,))
+    try:
+        total = nburn + nsweep
+        done = 0
+        parity = 0
+        while done < total:
+            n = min(swap_interval, total - done)
+            skip = max(0, nburn - done)
+            if executor is None:
+                segments = [_advance_replica(ham, configs[k], Ts[k], n, skip, method, rng) for k in range(n_temps)]
+            else:
+                seeds = rng.integers(2**63, size=n_temps)
+                segments = list(executor.map(_advance_in_worker, configs, Ts, [n] * n_temps, [skip] * n_temps,
+                                             [method] * n_temps, seeds))
+            for k, (config, segment_sums, energy) in enumerate(segments):
+                configs[k] = config
+                sums[k] += segment_sums
+                energies[k] = energy
+            done += n
+
+            # swap attempts between neighboring temperatures, even and odd pairs in turn
+            for k in range(parity, n_temps - 1, 2):
+                swaps_tried[k] += 1
+                log_p = (1.0 / Ts[k] - 1.0 / Ts[k + 1]) * (energies[k] - energies[k + 1])
+                if log_p >= 0.0 or rng.random() < np.exp(log_p):
+                    swaps_accepted[k] += 1
+                    configs[k], configs[k + 1] = configs[k + 1], configs[k]
+                    energies[[k, k + 1]] = energies[[k + 1, k]]
+                    replica_at[[k, k + 1]] = replica_at[[k + 1, k]]
+            parity = 1 - parity
+
+            # round trips: lowest -> highest -> lowest temperature
+            bottom, top = replica_at[0], replica_at[-1]
+            if last_end[top] == 0:
+                last_end[top] = 1
+            if last_end[bottom] == 1:
+                trip_times.append(done - trip_start[bottom])
+            if last_end[bottom] != 0:
+                last_end[bottom] = 0
+                trip_start[bottom] = done
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    for conf, config in zip(confs, configs):
+        conf.set_config(config)
+
+    results = {"T": Ts}
+    for j, name in enumerate(("E", "M", "EE", "MM")):
+        results[name] = sums[:, j] / nsweep
+    results["HC"] = (results["EE"] - results["E"] ** 2) / Ts ** 2
+    results["MS"] = (results["MM"] - results["M"] ** 2) / Ts
+    results["swap_acceptance"] = np.divide(swaps_accepted, swaps_tried, out=np.full(n_temps - 1, np.nan),
+                                           where=swaps_tried > 0)
+    results["round_trips"] = len(trip_times)
+    results["round_trip_time"] = np.mean(trip_times) if trip_times else np.nan
+    results["confs"] = confs
+    return results
+
+
+def _advance_replica(ham, config, T, n_sweeps, skip, method, rng):
+    """
+    Runs n_sweeps sweeps on a copy of config and sums E, M, E^2 and M^2 over the sweeps after the first skip.
+
+    Returns the new configuration, the sums and the final energy.
+    """
+    conf = BitString(N=ham.N)
+    conf.set_config(config)
+    state = SamplerState(ham, conf, refresh_interval=None)
+    sums = np.zeros(4)
+    for j in range(n_sweeps):
+        _sweep(ham, conf, T, method, rng, state)
+        if j >= skip:
+            sums += (state.E, state.M, state.E ** 2, state.M ** 2)
+    return conf.config, sums, state.E
+
+
+def _advance_in_worker(config, T, n_sweeps, skip, method, seed):
+    """
+    Runs _advance_replica in a pool worker with a generator seeded from seed.
+    """
+    return _advance_replica(_worker_hamiltonian(), config, T, n_sweeps, skip, method, np.random.default_rng(seed))
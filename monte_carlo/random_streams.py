@@ -0,0 +1,89 @@
+import numpy as np
+import random
+import json
+
+
+def _as_generator(rng=None):
+    """
+    Returns a numpy Generator for rng.
+
+    Parameters
+    ----------
+    rng : numpy.random.Generator, numpy.random.SeedSequence, int or None, optional
+        A Generator is returned as is, a seed or SeedSequence seeds a new one. With None the new
+        Generator is seeded from the global random module, so random.seed() keeps runs reproducible.
+
+    Returns
+    -------
+    numpy.random.Generator
+        The generator to draw from.
+    """
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if rng is None:
+        rng = random.getrandbits(64)
+    return np.random.default_rng(rng)
+
+
+def _sweep_generator(rng):
+    """
+    Returns the Generator a single sweep draws from: rng itself, or with None one seeded from the random module.
+
+    Seeds and SeedSequences are rejected: converted on every sweep, they would replay the same numbers in
+    every sweep. Callers convert them once, e.g. with numpy.random.default_rng, and pass the Generator.
+    """
+    if rng is not None and not isinstance(rng, np.random.Generator):
+        raise TypeError(f"A sweep needs a numpy.random.Generator or None, not {type(rng).__name__}; "
+                        "convert seeds once with numpy.random.default_rng.")
+    return _as_generator(rng)
+
+
+def _generator_state(rng):
+    """
+    Returns the state of a numpy Generator (or of the random module for None) as a JSON string.
+    """
+    if rng is None:
+        version, internal, gauss_next = random.getstate()
+        return json.dumps({"random": [version, list(internal), gauss_next]})
+    return json.dumps(rng.bit_generator.state)
+
+
+def _restore_generator(state):
+    """
+    Restores a state saved by _generator_state: the random module is reset in place and None is returned,
+    or a numpy Generator with that state is returned.
+    """
+    state = json.loads(state)
+    if "random" in state:
+        version, internal, gauss_next = state["random"]
+        random.setstate((version, tuple(internal), gauss_next))
+        return None
+    bit_generator = getattr(np.random, state["bit_generator"])()
+    bit_generator.state = state
+    return np.random.Generator(bit_generator)
+
+
+def spawn_generators(n, seed=None):
+    """
+    Returns n statistically independent numpy Generators, e.g. one per chain or per worker.
+
+    The streams are spawned from one SeedSequence, so they do not overlap and the whole set is reproduced
+    by the same seed, however the chains are later distributed over processes.
+
+    Parameters
+    ----------
+    n : int
+        The number of generators.
+    seed : int or numpy.random.SeedSequence, optional
+        The root seed. By default it is drawn from the random module, so random.seed() keeps runs reproducible.
+
+    Returns
+    -------
+    list of numpy.random.Generator
+        The generators.
+    """
+    if seed is None:
+        seed = random.getrandbits(128)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(n)]
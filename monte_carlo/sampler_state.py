@@ -0,0 +1,105 @@
+class SamplerState:
+    """
+    The running energy and magnetization of a configuration that is being sampled.
+
+    Sweeps that are given a SamplerState add the energy and magnetization changes of the flips they
+    accept, so measuring E and M after a sweep is O(1) instead of a full recomputation. The values are
+    recomputed from scratch every refresh_interval sweeps to stop floating-point drift.
+
+    With local_fields the state also stores the coupling field h_i = sum_j J_ij s_j of every site. The
+    sequential sweep then reads the energy change of a proposed flip in O(1), and pays O(degree) only for
+    accepted flips, to update the fields of the neighbors; this pays off on dense graphs and at low T, where
+    most proposals are rejected. Sweeps that do not maintain the fields leave them to be recomputed when next
+    needed.
+
+    Attributes:
+    - ham (IsingHamiltonian): The Hamiltonian the energy refers to.
+    - conf (BitString or numpy.ndarray): The configuration being sampled, or an (n_chains, N) array of 0/1 chains.
+    - E (float or numpy.ndarray): The current energy of conf, one per chain for an array of chains.
+    - M (float or numpy.ndarray): The current magnetization of conf, one per chain for an array of chains.
+    - n_sweeps (int): The number of sweeps recorded with end_sweep().
+    - refresh_interval (int or None): The number of sweeps between full recomputations (None for never).
+    - local_fields (bool): Whether the coupling fields of the sites are tracked.
+
+    Methods:
+    - update(self, delta_e, delta_m, fields_updated=False): Adds the changes of accepted flips.
+    - fields(self): Returns the tracked coupling fields, recomputing them if a sweep left them stale.
+    - end_sweep(self): Counts a finished sweep and refreshes E and M when due.
+    - refresh(self): Recomputes E, M and the tracked fields from the configuration.
+    """
+    def __init__(self, ham, conf, refresh_interval=1000, local_fields=False):
+        """
+        Constructs a SamplerState for conf, computing its energy and magnetization once.
+
+        Parameters
+        ----------
+        ham : IsingHamiltonian
+            The Hamiltonian the energy refers to.
+        conf : BitString or numpy.ndarray
+            The configuration being sampled, or an (n_chains, N) array of 0/1 chains.
+        refresh_interval : int or None, optional
+            The number of sweeps between full recomputations (default is 1000).
+        local_fields : bool, optional
+            Whether to track the coupling field of every site (default is False).
+        """
+        self.ham = ham
+        self.conf = conf
+        self.refresh_interval = refresh_interval
+        self.local_fields = local_fields
+        self.n_sweeps = 0
+        self.refresh()
+
+    def __repr__(self):
+        """
+        Returns a string representation of the sampler state.
+        """
+        return f"SamplerState(E={self.E}, M={self.M}, n_sweeps={self.n_sweeps})"
+
+    def update(self, delta_e, delta_m, fields_updated=False):
+        """
+        Adds the energy and magnetization changes of accepted flips.
+
+        Parameters
+        ----------
+        delta_e : float or numpy.ndarray
+            The total energy change, per chain for an array of chains.
+        delta_m : float or numpy.ndarray
+            The total magnetization change, per chain for an array of chains.
+        fields_updated : bool, optional
+            Whether the sweep also updated the tracked fields; otherwise they are marked stale (default is False).
+        """
+        self.E += delta_e
+        self.M += delta_m
+        if not fields_updated:
+            self._fields = None
+
+    def fields(self):
+        """
+        Returns the tracked coupling fields h_i = sum_j J_ij s_j, recomputing them if they are stale.
+
+        The returned array is the state's own, so a sweep that flips spins updates it in place and then calls
+        update() with fields_updated=True. Returns None if local_fields is off.
+        """
+        if not self.local_fields:
+            return None
+        if self._fields is None:
+            spins = 2.0 * getattr(self.conf, "config", self.conf) - 1.0
+            self._fields = self.ham.local_fields(spins)
+        return self._fields
+
+    def end_sweep(self):
+        """
+        Counts a finished sweep and recomputes E and M if refresh_interval sweeps have passed.
+        """
+        self.n_sweeps += 1
+        if self.refresh_interval and self.n_sweeps % self.refresh_interval == 0:
+            self.refresh()
+
+    def refresh(self):
+        """
+        Recomputes E, M and the tracked fields from the configuration.
+        """
+        spins = 2.0 * getattr(self.conf, "config", self.conf) - 1.0
+        self.E = self.ham._spin_energies(spins)
+        self.M = spins.sum(axis=-1)
+        self._fields = self.ham.local_fields(spins) if self.local_fields else None
@@ -0,0 +1,190 @@
+import numpy as np
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import itertools
+import time
+
+from .bitstring import BitString
+from .ising_hamiltonian import IsingHamiltonian
+from .metropolis_monte_carlo import stream_monte_carlo
+from .random_streams import spawn_generators
+from .shared import _init_worker, _worker_hamiltonian
+
+SCAN_COLUMNS = ("T", "mu", "seed", "E", "M", "HC", "MS", "seconds")
+
+
+def scan_tasks(Ts, mus=(None,), seeds=(0,)):
+    """
+    Builds the grid of (T, mu, seed) tasks of a scan, temperatures varying fastest.
+
+    Parameters
+    ----------
+    Ts : array_like
+        The temperatures.
+    mus : sequence, optional
+        The external fields, each a float (a uniform field), an array with one value per site, or None to keep
+        the field of the Hamiltonian (default is (None,)).
+    seeds : sequence of int, optional
+        The seeds of the independent runs at each (T, mu) (default is (0,)).
+
+    Returns
+    -------
+    list of tuple
+        The (T, mu, seed) tasks.
+    """
+    return [(float(T), mu, seed) for seed, mu, T in itertools.product(seeds, mus, Ts)]
+
+
+def scan_results(ham, tasks, nsweep=1000, nburn=100, method="sequential", n_workers=None, shared_memory=False):
+    """
+    Runs the tasks of a scan and yields their results as they finish.
+
+    Every task starts from all spins down and samples with its own generator. The tasks that share a seed
+    get independent streams spawned from it, in task order, so a result does not depend on the worker it ran
+    on or on the order in which the tasks finish. A task with a field samples a shallow copy of ham carrying
+    that field, so ham itself is never modified. With n_workers
+    the tasks are spread over a process pool; the Hamiltonian is sent to each worker once, when it starts,
+    and only the task parameters and the results travel afterwards. With shared_memory the workers do not
+    even receive a copy: the coupling arrays are placed in shared memory once and every worker samples a
+    read-only IsingHamiltonian built on them (see IsingHamiltonian.to_shared_memory).
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian to sample.
+    tasks : list of tuple
+        The (T, mu, seed) tasks, as built by scan_tasks.
+    nsweep : int, optional
+        The number of measured sweeps per task (default is 1000).
+    nburn : int, optional
+        The number of thermalization sweeps per task (default is 100).
+    method : str, optional
+        The move type, as in metropolis_monte_carlo (default is "sequential").
+    n_workers : int, optional
+        The size of the process pool (default is None, which runs the tasks serially in this process).
+    shared_memory : bool, optional
+        Whether the pool workers share one copy of the coupling arrays (default is False). Worth it for large
+        graphs; lattice Hamiltonians are small to send already and would lose their stencil.
+
+    Yields
+    ------
+    tuple of (int, dict)
+        The index of the task in tasks and its row, with the keys of SCAN_COLUMNS.
+    """
+    generators = _task_generators(tasks)
+    if n_workers is None:
+        for index, task in enumerate(tasks):
+            yield index, _run_scan_task(ham, task, generators[index], nsweep, nburn, method)
+        return
+
+    with contextlib.ExitStack() as stack:
+        if shared_memory:
+            initializer, initargs = _init_shared_worker, (stack.enter_context(ham.to_shared_memory()),)
+        else:
+            initializer, initargs = _init_worker, (ham,)
+        executor = stack.enter_context(concurrent.futures.ProcessPoolExecutor(
+            max_workers=n_workers, initializer=initializer, initargs=initargs))
+        futures = {executor.submit(_run_in_worker, task, generators[index], nsweep, nburn, method): index
+                   for index, task in enumerate(tasks)}
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+
+def temperature_scan(ham, Ts, mus=(None,), seeds=(0,), nsweep=1000, nburn=100, method="sequential", n_workers=None,
+                     output=None, shared_memory=False):
+    """
+    Runs metropolis_monte_carlo-style sampling over a grid of temperatures, fields and seeds.
+
+    Parameters
+    ----------
+    ham : IsingHamiltonian
+        The Hamiltonian to sample.
+    Ts : array_like
+        The temperatures.
+    mus : sequence, optional
+        The external fields, each a float, a per-site array or None (see scan_tasks).
+    seeds : sequence of int, optional
+        The seeds of the independent runs at each (T, mu) (default is (0,)).
+    nsweep : int, optional
+        The number of measured sweeps per task (default is 1000).
+    nburn : int, optional
+        The number of thermalization sweeps per task (default is 100).
+    method : str, optional
+        The move type, as in metropolis_monte_carlo (default is "sequential").
+    n_workers : int, optional
+        The size of the process pool (default is None, serial).
+    output : str or os.PathLike, optional
+        A CSV file the rows are appended to as the tasks finish, so a long scan can be watched and partial
+        results survive an interruption (default is None).
+    shared_memory : bool, optional
+        Whether the pool workers share one copy of the coupling arrays (see scan_results, default is False).
+
+    Returns
+    -------
+    dict
+        The results table, one numpy array per column of SCAN_COLUMNS, in the order of scan_tasks. The mu column
+        holds the uniform field value, or NaN for per-site or unchanged fields.
+    """
+    tasks = scan_tasks(Ts, mus, seeds)
+    rows = [None] * len(tasks)
+    writer = None
+    with (open(output, "w", newline="") if output is not None else contextlib.nullcontext()) as f:
+        if output is not None:
+            writer = csv.DictWriter(f, fieldnames=SCAN_COLUMNS)
+            writer.writeheader()
+        for index, row in scan_results(ham, tasks, nsweep, nburn, method, n_workers, shared_memory):
+            rows[index] = row
+            if writer is not None:
+                writer.writerow(row)
+                f.flush()
+    return {name: np.array([row[name] for row in rows]) for name in SCAN_COLUMNS}
+
+
+def _task_generators(tasks):
+    """
+    Returns one generator per task, spawned from the task's seed, so that tasks sharing a seed are independent.
+    """
+    counts = collections.Counter(seed for _, _, seed in tasks)
+    spawned = {seed: iter(spawn_generators(n, seed)) for seed, n in counts.items()}
+    return [next(spawned[seed]) for _, _, seed in tasks]
+
+
+def _with_field(ham, mu):
+    """
+    Returns a shallow copy of ham, sharing its couplings and caches, with the external field mu.
+    """
+    copy = ham.__class__.__new__(ham.__class__)
+    copy.__dict__.update(ham.__dict__)
+    copy.mu = np.broadcast_to(np.asarray(mu, dtype=float), (ham.N,)).copy()
+    return copy
+
+
+def _run_scan_task(ham, task, rng, nsweep, nburn, method):
+    """
+    Samples one (T, mu, seed) task with the generator rng and returns its row of the results table.
+    """
+    T, mu, seed = task
+    start = time.perf_counter()
+    if mu is not None:
+        ham = _with_field(ham, mu)
+    conf = BitString(N=ham.N)
+    welford, = stream_monte_carlo(ham, conf, T=T, nsweep=nsweep, nburn=nburn, method=method, rng=rng)
+    E, M, HC, MS = welford.averages(T)
+    return {"T": T, "mu": float(mu) if np.ndim(mu) == 0 and mu is not None else np.nan, "seed": seed,
+            "E": E, "M": M, "HC": HC, "MS": MS, "seconds": time.perf_counter() - start}
+
+
+def _init_shared_worker(handle):
+    """
+    Builds the Hamiltonian of a pool worker on the shared memory block of handle.
+    """
+    _init_worker(IsingHamiltonian.from_shared_memory(handle))
+
+
+def _run_in_worker(task, rng, nsweep, nburn, method):
+    """
+    Runs _run_scan_task in a pool worker on the Hamiltonian stored by _init_worker.
+    """
+    return _run_scan_task(_worker_hamiltonian(), task, rng, nsweep, nburn, method)
@@ -0,0 +1,160 @@
+import numpy as np
+import contextlib
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+# the Hamiltonian of a process-pool worker, stored once per process by _init_worker
+_WORKER_HAM = None
+
+
+class SharedHamiltonian:
+    """
+    A handle to the coupling arrays and field of an IsingHamiltonian in a multiprocessing.shared_memory block.
+
+    The handle created by IsingHamiltonian.to_shared_memory owns the block: it must be closed and unlinked
+    when the workers are done, which the with statement does. Pickling the handle only sends the name of the
+    block and the array layout, so it can be passed to any number of processes on the same machine, which
+    rebuild the Hamiltonian with IsingHamiltonian.from_shared_memory without copying the arrays.
+
+    Attributes:
+    - name (str): The name of the shared memory block.
+    - N (int): The number of spins.
+    - layout (dict): The dtype, length and byte offset of each array in the block.
+    - diag_sum (float): The constant energy of the self couplings.
+
+    Methods:
+    - arrays(self): Returns read-only views of the arrays in the block.
+    - close(self): Closes this process's mapping of the block.
+    - unlink(self): Frees the block, once every process has closed it.
+    """
+    _ARRAYS = ("indptr", "indices", "data", "mu")
+
+    def __init__(self, indptr, indices, data, mu, diag_sum=0.0):
+        """
+        Copies the arrays into a new shared memory block.
+
+        Parameters
+        ----------
+        indptr, indices, data : numpy.ndarray
+            The CSR coupling arrays.
+        mu : numpy.ndarray
+            The external field on every site.
+        diag_sum : float, optional
+            The constant energy of the self couplings (default is 0.0).
+        """
+        arrays = dict(zip(self._ARRAYS, (indptr, indices, data, np.asarray(mu, dtype=float))))
+        self.N = len(indptr) - 1
+        self.diag_sum = diag_sum
+        self.layout = {}
+        offset = 0
+        for key, array in arrays.items():
+            self.layout[key] = (array.dtype.str, len(array), offset)
+            # keep every array 8-byte aligned
+            offset += -(-array.nbytes // 8) * 8
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.name = self._shm.name
+        for key, array in arrays.items():
+            dtype, length, start = self.layout[key]
+            np.ndarray(length, dtype=dtype, buffer=self._shm.buf, offset=start)[:] = array
+
+    def __getstate__(self):
+        """
+        Returns the picklable part of the handle: everything but the mapping of the block.
+        """
+        state = dict(self.__dict__)
+        state["_shm"] = None
+        return state
+
+    def __repr__(self):
+        """
+        Returns a string representation of the handle.
+        """
+        return f"SharedHamiltonian(name={self.name!r}, N={self.N})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.unlink()
+        self.close()
+        return False
+
+    def arrays(self):
+        """
+        Maps the block into this process (once) and returns read-only views of indptr, indices, data and mu.
+
+        Returns
+        -------
+        dict
+            The arrays, keyed by name.
+        """
+        if self._shm is None:
+            self._shm = _attach(self.name)
+        views = {}
+        for key, (dtype, length, start) in self.layout.items():
+            view = np.ndarray(length, dtype=dtype, buffer=self._shm.buf, offset=start)
+            view.flags.writeable = False
+            views[key] = view
+        return views
+
+    def close(self):
+        """
+        Closes this process's mapping of the block. If a Hamiltonian in this process still uses the arrays, the
+        mapping is kept open for it.
+        """
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                return
+            self._shm = None
+
+    def unlink(self):
+        """
+        Frees the block. Processes that still map it keep their mapping until they close it.
+        """
+        shm = self._shm if self._shm is not None else _attach(self.name)
+        shm.unlink()
+        if shm is not self._shm:
+            shm.close()
+
+
+def _attach(name):
+    """
+    Maps an existing shared memory block without registering it with this process's resource tracker.
+
+    The tracker would otherwise unlink the block when the attaching process (e.g. a pool worker) exits,
+    while other processes are still using it.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    with _untracked():
+        return shared_memory.SharedMemory(name=name)
+
+
+@contextlib.contextmanager
+def _untracked():
+    """
+    Temporarily stops shared memory blocks from being registered with the resource tracker.
+    """
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None if rtype == "shared_memory" else register(name, rtype)
+    try:
+        yield
+    finally:
+        resource_tracker.register = register
+
+
+def _init_worker(ham):
+    """
+    Stores the Hamiltonian in a pool worker, so it is sent only once per process.
+    """
+    global _WORKER_HAM
+    _WORKER_HAM = ham
+
+
+def _worker_hamiltonian():
+    """
+    Returns the Hamiltonian stored by _init_worker in this pool worker.
+    """
+    return _WORKER_HAM
@@ -0,0 +1,59 @@
+import numpy as np
+import struct
+
+# magic, format version, index itemsize, N, number of stored couplings, energy of the self couplings
+_HEADER = struct.Struct("<8sIIqqd")
+_MAGIC = b"ISINGCSR"
+_VERSION = 1
+_ALIGN = 64
+
+
+def _layout(N, nnz, index_itemsize):
+    """
+    Returns the (name, dtype, length, offset) of each array in a file, every array 64-byte aligned.
+    """
+    arrays = [("indptr", "<i8", N + 1), ("indices", f"<i{index_itemsize}", nnz), ("data", "<f8", nnz),
+              ("mu", "<f8", N)]
+    layout = []
+    offset = _ALIGN
+    for name, dtype, length in arrays:
+        layout.append((name, dtype, length, offset))
+        offset += -(-length * np.dtype(dtype).itemsize // _ALIGN) * _ALIGN
+    return layout
+
+
+def _write_csr(path, indptr, indices, data, mu, diag_sum):
+    """
+    Writes the CSR coupling arrays and the field to path, after a fixed-size header.
+    """
+    N = len(indptr) - 1
+    index_itemsize = np.dtype(indices.dtype).itemsize
+    arrays = {"indptr": indptr, "indices": indices, "data": data, "mu": mu}
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, index_itemsize, N, len(data), diag_sum))
+        for name, dtype, length, offset in _layout(N, len(data), index_itemsize):
+            f.write(b"\0" * (offset - f.tell()))
+            np.ascontiguousarray(arrays[name], dtype=dtype).tofile(f)
+
+
+def _map_csr(path, mmap=True):
+    """
+    Reads the header of a file written by _write_csr and returns N, the self-coupling energy and the
+    arrays, as read-only memory maps (or in memory with mmap=False).
+    """
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or header[:8] != _MAGIC:
+        raise ValueError(f"{path} is not an Ising Hamiltonian file.")
+    _, version, index_itemsize, N, nnz, diag_sum = _HEADER.unpack(header)
+    if version != _VERSION:
+        raise ValueError(f"Unsupported Ising Hamiltonian file version {version}.")
+
+    arrays = {}
+    for name, dtype, length, offset in _layout(N, nnz, index_itemsize):
+        if not mmap or length == 0:
+            # an empty array cannot be memory-mapped
+            arrays[name] = np.fromfile(path, dtype=dtype, count=length, offset=offset)
+        else:
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(length,))
+    return N, diag_sum, arrays
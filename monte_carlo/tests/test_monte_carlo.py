@@ -9,6 +9,7 @@ import sys
 import random
 import numpy as np
 import copy as cp
+import pickle
 import networkx as nx
 
 def test_monte_carlo_imported():
@@ -261,6 +262,741 @@ def test_delta_e():
 
     assert(np.isclose(e2-e1, delta_e1))
     
+def test_csr_couplings():
+    random.seed(2)
+    N = 12
+    G = build_1d_graph(N, 1.0)
+    G.add_edge(2, 7, weight=-0.5)
+    mus = [.1 * i for i in range(N)]
+    ham = get_IsingHamiltonian(G, mus=mus)
+
+    edges = [(i, j, G.edges[i, j]['weight']) for i, j in G.edges]
+    ham2 = monte_carlo.IsingHamiltonian.from_edge_list(edges, mu=mus)
+    assert(all(ham.indptr == ham2.indptr))
+
+    conf = monte_carlo.BitString(N=N)
+    for state in [0, 1, 106, 2047, 3000]:
+        conf.set_int_config(state)
+        e_ref = 0.0
+        for i, j in G.edges:
+            s_i, s_j = 2 * conf[i] - 1, 2 * conf[j] - 1
+            e_ref += G.edges[i, j]['weight'] * s_i * s_j
+        e_ref += np.dot(mus, 2 * conf.config - 1)
+        assert(np.isclose(ham.energy(conf), e_ref))
+        assert(np.isclose(ham2.energy(conf), e_ref))
+
+    assert(ham.J[2] == [(1, 1.0), (3, 1.0), (7, -0.5)])
+
+    # assigning J rebuilds the couplings, self couplings included
+    J = ham.J
+    J[0] = J[0] + [(0, 0.5)]
+    ham2.J = J
+    assert(np.isclose(ham2.energy(conf), ham.energy(conf) + 0.5))
+    assert(ham2.J == ham.J)
+    dense = monte_carlo.DenseIsingHamiltonian.from_hamiltonian(ham, dtype=np.float32)
+    dense.J = J
+    assert(dense.matrix.dtype == np.float32 and np.isclose(dense.energy(conf), ham2.energy(conf)))
+
+    # a bond listed from one end only, or with different strengths at its two ends, is rejected
+    with pytest.raises(ValueError):
+        monte_carlo.IsingHamiltonian(J=[[(1, 1.0)], []], mu=np.zeros(2))
+    with pytest.raises(ValueError):
+        monte_carlo.IsingHamiltonian(J=[[(1, 1.0)], [(0, 0.5)]], mu=np.zeros(2))
+
+    pytest.importorskip("scipy.sparse")
+    ham3 = monte_carlo.IsingHamiltonian(nx.to_scipy_sparse_array(G, nodelist=range(N)), mu=mus)
+    conf.set_int_config(106)
+    assert(np.isclose(ham3.energy(conf), ham.energy(conf)))
+
+def test_enumeration_chunks():
+    N = 10
+    conf = monte_carlo.BitString(N=N)
+    J = []
+    for i in range(N):
+        J.append([((i+1) % N, 1.0), ((i-1) % N, 1.0)])
+    ham = monte_carlo.IsingHamiltonian(J=J, mu=[.1 for i in range(N)])
+
+    # small chunks must give the same answer as a single chunk
+    for val, ref in zip(ham.compute_average_values(conf, 2.0, chunk_size=100),
+                        ham.compute_average_values(conf, 2.0)):
+        assert(np.isclose(val, ref))
+
+    # Gray-code order must reproduce the direct enumeration
+    for chunk_size in [1, 64, 2**14]:
+        for val, ref in zip(ham.compute_average_values(conf, 2.0, chunk_size=chunk_size, method="gray"),
+                            ham.compute_average_values(conf, 2.0)):
+            assert(np.isclose(val, ref))
+
+    with pytest.raises(ValueError):
+        ham.compute_average_values(conf, 2.0, method="random")
+
+    # exp(-E/T) would overflow here without log-sum-exp accumulation
+    E, M, HC, MS = ham.compute_average_values(conf, 0.001)
+    assert(np.isclose(E, -10.0))
+    assert(np.isclose(M, 0.0))
+    assert(np.isfinite(HC) and np.isfinite(MS))
+
+def test_density_of_states():
+    N = 8
+    conf = monte_carlo.BitString(N=N)
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+
+    dos = ham.density_of_states()
+    assert(dos.counts.sum() == 2**N)
+
+    T_list = .1 * np.arange(1, 100)
+    E, M, HC, MS = ham.compute_average_values_over(T_list)
+    Tc_ind = np.argmax(MS)
+    assert(np.isclose(T_list[Tc_ind], 2.0))
+    assert(np.isclose(E[Tc_ind], -3.73231850))
+    assert(np.isclose(M[Tc_ind], -0.14658168))
+    assert(np.isclose(HC[Tc_ind], 1.64589165))
+    assert(np.isclose(MS[Tc_ind], 1.46663062))
+
+    for T in [.3, 1.0, 4.5]:
+        for val, ref in zip(dos.averages(T), ham.compute_average_values(conf, T)):
+            assert(np.isclose(val, ref))
+
+def test_numba_sweep(monkeypatch):
+    N = 8
+    T = 2
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    E_exact, M_exact, HC_exact, MS_exact = ham.compute_average_values(monte_carlo.BitString(N=N), T)
+
+    conf = monte_carlo.BitString(N=N)
+    E, M, EE, MM = monte_carlo.metropolis_monte_carlo(ham, conf, T=T, nsweep=20000, nburn=1000,
+                                                      method="numba", rng=np.random.default_rng(4))
+    assert(abs(E[-1] - E_exact) < .05)
+    assert(abs(M[-1] - M_exact) < .1)
+
+    with pytest.raises(ValueError):
+        ham.metropolis_sweep(conf, T=T, method="parallel")
+
+    # without Numba the sweep falls back to the sequential Python path
+    monkeypatch.setattr(monte_carlo.kernels, "_metropolis_kernel_jit", None)
+    conf.set_int_config(44)
+    conf_ref = cp.deepcopy(conf)
+    random.seed(2)
+    ham.metropolis_sweep(conf, T=.9, method="numba")
+    random.seed(2)
+    ham.metropolis_sweep(conf_ref, T=.9)
+    assert(all(conf.config == conf_ref.config))
+
+def test_checkerboard_sweep():
+    N = 8
+    T = 2
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    assert(all(ham.coloring() == [0, 1, 0, 1, 0, 1, 0, 1]))
+
+    conf = monte_carlo.BitString(N=N)
+    E, M, EE, MM = monte_carlo.metropolis_monte_carlo(ham, conf, T=T, nsweep=20000, nburn=1000,
+                                                      method="checkerboard", rng=3)
+    assert(abs(E[-1] + 3.73231850) < .05)
+    assert(abs(M[-1] + 0.14658168) < .1)
+
+    # a greedy coloring of any graph never gives coupled sites the same color
+    G = nx.gnm_random_graph(30, 90, seed=1)
+    nx.set_edge_attributes(G, 1.0, 'weight')
+    ham = get_IsingHamiltonian(G)
+    colors = ham.coloring()
+    for i, j in G.edges:
+        assert(colors[i] != colors[j])
+
+def test_metropolis_batch():
+    N = 8
+    T = 2
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+
+    results = monte_carlo.metropolis_monte_carlo_batch(ham, 64, T=T, nsweep=2000, nburn=200, rng=1)
+    assert(results["E"].shape == (64,))
+    for name, exact in [("E", -3.73231850), ("M", -0.14658168), ("HC", 1.64589165), ("MS", 1.46663062)]:
+        assert(abs(results["mean"][name] - exact) < 5 * results["stderr"][name] + .02)
+
+    # chains given as an array are updated in place
+    confs = np.zeros((3, N), dtype=np.uint8)
+    results = monte_carlo.metropolis_monte_carlo_batch(ham, confs, T=.1, nsweep=10, nburn=10, rng=1)
+    assert(all(np.isclose(results["E"], -8.0)))
+    assert(all(confs.sum(axis=1) == N // 2))
+
+def test_parallel_tempering():
+    N = 8
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    Ts = np.linspace(.5, 3.0, 6)
+    E_exact, M_exact, HC_exact, MS_exact = ham.compute_average_values_over(Ts)
+
+    results = monte_carlo.parallel_tempering(ham, Ts, nsweep=4000, nburn=200, method="checkerboard", rng=1)
+    assert(np.allclose(results["E"], E_exact, atol=.15))
+    assert(all(results["swap_acceptance"] > 0))
+    assert(results["round_trips"] > 0)
+    assert(len(results["confs"]) == len(Ts))
+
+    results = monte_carlo.parallel_tempering(ham, Ts, nsweep=200, nburn=20, swap_interval=20,
+                                             method="checkerboard", n_workers=2, rng=1)
+    assert(results["E"].shape == Ts.shape)
+    assert(all(np.isfinite(results["E"])))
+
+def build_2d_graph(L, Jval):
+    """
+    Build a periodic LxL square lattice with a single J value (Jval)
+    """
+    G = nx.grid_2d_graph(L, L, periodic=True)
+    G = nx.convert_node_labels_to_integers(G, ordering="sorted")
+    nx.set_edge_attributes(G, Jval, 'weight')
+    return G
+
+
+def build_random_graph(N, n_edges, seed):
+    """
+    Build a random graph with n_edges bonds whose weights are drawn from one seeded normal distribution
+    """
+    G = nx.gnm_random_graph(N, n_edges, seed=seed)
+    rng = np.random.default_rng(seed)
+    for e in G.edges:
+        G.edges[e]['weight'] = rng.normal()
+    return G
+
+
+def test_cluster_moves():
+    N = 8
+    T = 2
+    G = build_1d_graph(N, -1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    E_exact, M_exact, HC_exact, MS_exact = ham.compute_average_values(monte_carlo.BitString(N=N), T)
+
+    for method in ["wolff", "swendsen-wang"]:
+        conf = monte_carlo.BitString(N=N)
+        E, M, EE, MM = monte_carlo.metropolis_monte_carlo(ham, conf, T=T, nsweep=20000, nburn=500,
+                                                          method=method, rng=2)
+        assert(abs(E[-1] - E_exact) < .1)
+        assert(abs(M[-1] - M_exact) < .2)
+
+    # near the critical temperature cluster moves decorrelate |M| much faster than Metropolis
+    G = build_2d_graph(12, -1.0)
+    ham = get_IsingHamiltonian(G)
+    taus = monte_carlo.compare_autocorrelation_times(ham, monte_carlo.BitString(N=144), 2.27,
+                                                     methods=("checkerboard", "swendsen-wang"), nsweep=2000, rng=1)
+    assert(taus["swendsen-wang"]["tau_absM"] < taus["checkerboard"]["tau_absM"])
+
+def test_incremental_tracking():
+    G = build_random_graph(24, 60, seed=3)
+    ham = get_IsingHamiltonian(G, mus=list(np.linspace(-.5, .5, 24)))
+
+    moves = {
+        "sequential": lambda conf, rng, state: ham.metropolis_sweep(conf, 1.5, state=state),
+        "numba": lambda conf, rng, state: ham.metropolis_sweep(conf, 1.5, "numba", rng, state),
+        "checkerboard": lambda conf, rng, state: ham.metropolis_sweep(conf, 1.5, "checkerboard", rng, state),
+        "wolff": lambda conf, rng, state: monte_carlo.wolff_sweep(ham, conf, 1.5, rng, state=state),
+        "swendsen-wang": lambda conf, rng, state: monte_carlo.swendsen_wang_sweep(ham, conf, 1.5, rng, state=state),
+    }
+    random.seed(2)
+    for move in moves.values():
+        conf = monte_carlo.BitString(N=24)
+        conf.initialize(M=12)
+        state = monte_carlo.SamplerState(ham, conf, refresh_interval=None)
+        rng = np.random.default_rng(1)
+        for _ in range(50):
+            move(conf, rng, state)
+        assert(state.n_sweeps == 50)
+        assert(np.isclose(state.E, ham.energy(conf)))
+        assert(np.isclose(state.M, conf.get_magnetization()))
+
+    # a self coupling only shifts the energy
+    ham = monte_carlo.IsingHamiltonian(J=[[(0, .5), (1, 1.0)], [(0, 1.0)]], mu=[0.0, 0.0])
+    conf = monte_carlo.BitString(N=2)
+    assert(np.isclose(ham.energy(conf), 1.5))
+    assert(np.isclose(ham.delta_e_for_flip(0, conf), -2.0))
+
+def test_bitstring_storage():
+    conf = monte_carlo.BitString(N=70)
+    assert(conf.config.dtype == np.int8)
+    for index in [0, 1, 106, 2**69 + 12345, 2**70 - 1]:
+        conf.set_int_config(index)
+        assert(conf.get_int_config() == index)
+        assert(str(conf) == np.binary_repr(index, width=70))
+        assert(conf.get_magnetization() == 2 * bin(index).count("1") - 70)
+
+    conf.set_int_config(2**69 + 12345)
+    restored = monte_carlo.BitString.from_packed(conf.packed(), 70)
+    assert(len(conf.packed()) == 9)
+    assert(all(restored.config == conf.config))
+
+    # set_config copies unless asked not to, and views share memory with the configuration
+    arr = np.zeros(70, dtype=np.int8)
+    conf.set_config(arr)
+    conf.flip_site(5)
+    assert(arr[5] == 0 and not np.shares_memory(conf.config, arr))
+    conf.set_config(arr, copy=False)
+    conf.flip_site(5)
+    assert(arr[5] == 1)
+    assert(conf[5] == 1 and 2 * conf[0] - 1 == -1)
+    assert(all(2 * conf.config[:2] - 1 == [-1, -1]))
+    assert(np.shares_memory(conf.view(), arr))
+
+def test_lattices(tmp_path):
+    # the implicit square lattice matches the same lattice built with networkx
+    G = build_2d_graph(6, -1.0)
+    ham = get_IsingHamiltonian(G, mus=[.2 for i in range(36)])
+    lattice = monte_carlo.hypercubic_lattice((6, 6), J=-1.0, mu=.2)
+    spins = np.random.default_rng(0).choice([-1.0, 1.0], size=(5, 36))
+    assert(np.allclose(lattice.local_fields(spins), ham.local_fields(spins)))
+    assert(all(np.bincount(lattice.coloring()) == 18))
+
+    conf = monte_carlo.BitString(N=36)
+    conf.set_int_config(2**35 + 2**20 + 77)
+    assert(np.isclose(lattice.energy(conf), ham.energy(conf)))
+    for i in [0, 7, 35]:
+        assert(np.isclose(lattice.delta_e_for_flip(i, conf), ham.delta_e_for_flip(i, conf)))
+    # CSR arrays are only built when a method asks for explicit neighbor lists
+    assert(lattice._csr is None)
+    assert(all(lattice.indptr == ham.indptr))
+    assert([sorted(row) for row in lattice.J] == [sorted(row) for row in ham.J])
+
+    # the stencil neighbors and the fields of each color class match the explicit lattice
+    for lattice in (monte_carlo.honeycomb_lattice(4, 6, periodic=False), monte_carlo.triangular_lattice(6, 6)):
+        full = lattice.local_fields(spins[:, :lattice.N])
+        for sites, fields in lattice._color_class_fields():
+            assert(np.allclose(fields(spins[:, :lattice.N]), full[:, sites]))
+        for i in range(lattice.N):
+            nodes, js = lattice.neighbors(i)
+            lo, hi = lattice.indptr[i], lattice.indptr[i + 1]
+            assert(sorted(nodes) == sorted(lattice.indices[lo:hi]) and np.isclose(js.sum(), lattice.data[lo:hi].sum()))
+
+    # saved and shared lattices come back as explicit neighbor lists
+    lattice = monte_carlo.hypercubic_lattice((6, 6), J=-1.0, mu=.2)
+    lattice.save(tmp_path / "lattice.bin")
+    loaded = monte_carlo.LatticeIsingHamiltonian.load(tmp_path / "lattice.bin")
+    assert(np.isclose(loaded.energy(conf), lattice.energy(conf)))
+    with lattice.to_shared_memory() as handle:
+        shared = monte_carlo.LatticeIsingHamiltonian.from_shared_memory(handle)
+        assert(np.isclose(shared.energy(conf), lattice.energy(conf)))
+        del shared
+
+    # coordination numbers and boundaries
+    assert(all(np.diff(monte_carlo.triangular_lattice(6, 6).indptr) == 6))
+    assert(all(np.diff(monte_carlo.honeycomb_lattice(4, 6).indptr) == 3))
+    assert(sum(np.diff(monte_carlo.hypercubic_lattice((3, 4, 5), periodic=False).indptr)) == 2 * 133)
+    with pytest.raises(ValueError):
+        monte_carlo.honeycomb_lattice(5, 6)
+
+    # sampling works through the stencil fields
+    chain = monte_carlo.hypercubic_lattice(8, J=1.0, mu=.1)
+    E, M, HC, MS = chain.compute_average_values(monte_carlo.BitString(N=8), 2)
+    assert(np.isclose(E, -3.73231850))
+    results = monte_carlo.metropolis_monte_carlo_batch(chain, 32, T=2, nsweep=2000, nburn=200, rng=5)
+    assert(abs(results["mean"]["E"] - E) < .1)
+
+def test_streaming_accumulators():
+    chain = monte_carlo.hypercubic_lattice(8, J=-1.0, mu=.1)
+    conf = monte_carlo.BitString(N=8)
+
+    # the Welford averages match the running means of metropolis_monte_carlo on the same stream
+    random.seed(2)
+    E, M, EE, MM = monte_carlo.metropolis_monte_carlo(chain, cp.deepcopy(conf), T=2, nsweep=500, nburn=50)
+    random.seed(2)
+    welford, binning, histogram, trace = monte_carlo.stream_monte_carlo(
+        chain, cp.deepcopy(conf), T=2, nsweep=500, nburn=50,
+        accumulators=[monte_carlo.WelfordAccumulator(), monte_carlo.BinningAccumulator(bin_size=50),
+                      monte_carlo.HistogramAccumulator(19, (-9.5, 9.5)), monte_carlo.TraceAccumulator()])
+    assert(welford.n == 500)
+    assert(np.allclose(welford.mean, (E[-1], M[-1])))
+    assert(np.allclose(welford.variance(), (EE[-1] - E[-1]**2, MM[-1] - M[-1]**2)))
+    assert(np.allclose(welford.mean, (trace.E.mean(), trace.M.mean())))
+    assert(binning.bins.n == 10)
+    assert(np.all(binning.standard_error() > 0))
+    assert(histogram.counts.sum() + histogram.underflow + histogram.overflow == 500)
+    assert(np.array_equal(histogram.counts, np.histogram(trace.E, histogram.edges)[0]))
+
+    # thinning keeps the first sample and every thin-th sweep after it
+    random.seed(2)
+    thinned = monte_carlo.stream_monte_carlo(chain, cp.deepcopy(conf), T=2, nsweep=500, nburn=50,
+                                             accumulators=[monte_carlo.TraceAccumulator()], thin=10)[0]
+    assert(np.array_equal(thinned.E, trace.E[::10]))
+
+def test_blocking_analysis():
+    # uncorrelated samples: a single blocking level, tau = 1/2 and ESS = n
+    noise = np.random.default_rng(0).normal(size=4096)
+    analysis = monte_carlo.BlockingAnalysis()
+    for x in noise:
+        analysis.add(x, 2 * x)
+    assert(analysis.level() == 0)
+    assert(np.allclose(analysis.effective_sample_size(), 4096))
+    averages, errors = analysis.errors(1.0)
+    assert(np.isclose(errors["E"], noise.std() / np.sqrt(4095)))
+    assert(np.isclose(errors["M"], 2 * errors["E"]))
+
+    # a correlated Markov chain stops early, with errors consistent with exact enumeration
+    chain = monte_carlo.hypercubic_lattice(8, J=-1.0, mu=.1)
+    conf = monte_carlo.BitString(N=8)
+    exact = dict(zip(("E", "M", "HC", "MS"), chain.compute_average_values(conf, 2)))
+    random.seed(2)
+    analysis = monte_carlo.sample_until_converged(chain, conf, 2, rel_error=0.05, max_sweeps=20000,
+                                                  check_interval=500)
+    assert(analysis.n < 20000)
+    assert(np.all(analysis.autocorrelation_times()[[0, 2]] > 1))
+    averages, errors = analysis.errors(2)
+    for name in ("E", "HC", "MS"):
+        assert(errors[name] <= .05 * abs(averages[name]))
+        assert(abs(averages[name] - exact[name]) < 4 * errors[name])
+    with pytest.raises(ValueError):
+        monte_carlo.sample_until_converged(chain, conf, 2, observables=("Cv",))
+
+def test_checkpoint_restart(tmp_path, monkeypatch):
+    G = build_2d_graph(4, -1.0)
+    for method in ("sequential", "checkerboard"):
+        ham = get_IsingHamiltonian(G, mus=[.1] * 16)
+        conf = monte_carlo.BitString(N=16)
+        random.seed(2)
+        expected = monte_carlo.metropolis_monte_carlo(ham, cp.deepcopy(conf), T=2, nsweep=300, nburn=20,
+                                                      method=method, refresh_interval=70)
+
+        # preempt the run after 150 measured sweeps, past the checkpoint at 100
+        class Preempted(Exception):
+            pass
+        calls = []
+        sweep = ham.metropolis_sweep
+        def preemptible_sweep(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 20 + 150:
+                raise Preempted
+            return sweep(*args, **kwargs)
+        monkeypatch.setattr(ham, "metropolis_sweep", preemptible_sweep)
+        path = tmp_path / f"{method}.npz"
+        random.seed(2)
+        with pytest.raises(Preempted):
+            monte_carlo.metropolis_monte_carlo(ham, cp.deepcopy(conf), T=2, nsweep=300, nburn=20, method=method,
+                                               refresh_interval=70, checkpoint=path, checkpoint_interval=100)
+        monkeypatch.undo()
+        assert(monte_carlo.load_checkpoint(path)["start"] == 100)
+
+        # the checkpoint holds no history; the history file holds the 100 checkpointed rows of running means
+        assert("samples" not in monte_carlo.load_checkpoint(path))
+        assert((tmp_path / f"{method}.npz.history").stat().st_size == 100 * 4 * 8)
+
+        random.seed(99)
+        final = monte_carlo.BitString(N=16)
+        resumed = monte_carlo.resume_monte_carlo(ham, path, checkpoint_interval=100, conf=final)
+        for a, b in zip(expected, resumed):
+            assert(np.array_equal(a, b))
+        assert(monte_carlo.load_checkpoint(path)["start"] == 300)
+        assert(np.isclose(ham.energy(final), monte_carlo.load_checkpoint(path)["E"]))
+        # no temporary files are left behind
+        assert(not any(p.name.endswith(".tmp") for p in tmp_path.iterdir()))
+
+def test_rng_streams():
+    N = 8
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+
+    # an explicit generator makes the sequential sweep independent of the random module
+    runs = []
+    for junk in (1, 2):
+        random.seed(junk)
+        conf = monte_carlo.BitString(N=N)
+        conf.initialize(M=4, rng=np.random.SeedSequence(7))
+        assert(sum(conf.config) == 4)
+        runs.append(monte_carlo.metropolis_monte_carlo(ham, conf, T=2, nsweep=4000, nburn=100, rng=7))
+    for a, b in zip(*runs):
+        assert(np.array_equal(a, b))
+    assert(abs(runs[0][0][-1] + 3.73231850) < .1)
+
+    # spawned streams are reproducible and independent
+    first = [g.random(4) for g in monte_carlo.spawn_generators(3, seed=11)]
+    second = [g.random(4) for g in monte_carlo.spawn_generators(3, seed=np.random.SeedSequence(11))]
+    assert(np.array_equal(first, second))
+    assert(len({tuple(x) for x in first}) == 3)
+
+    # single sweeps take generators only, since a seed would replay the same numbers every sweep
+    for method in ("sequential", "checkerboard"):
+        with pytest.raises(TypeError):
+            ham.metropolis_sweep(conf, 2, method, rng=7)
+    with pytest.raises(TypeError):
+        monte_carlo.wolff_sweep(ham, conf, 2, rng=np.random.SeedSequence(7))
+
+def test_temperature_scan(tmp_path):
+    N = 8
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    Ts = [1.0, 2.0, 3.0]
+
+    table = monte_carlo.temperature_scan(ham, Ts, mus=(.1, .5), seeds=(0, 1), nsweep=1000, nburn=100,
+                                         method="checkerboard", output=tmp_path / "scan.csv")
+    assert(len(table["T"]) == 12)
+    assert(np.array_equal(table["T"][:3], Ts))
+    assert(np.array_equal(table["mu"], np.repeat([.1, .5, .1, .5], 3)))
+    exact = ham.compute_average_values_over(Ts)[0]
+    assert(np.allclose(table["E"][:3], exact, atol=.15))
+    mu = ham.mu
+    assert(np.allclose(ham.mu, .1))
+    with open(tmp_path / "scan.csv") as f:
+        assert(len(f.readlines()) == 13)
+    # the tasks sharing a seed sample independent streams, and the Hamiltonian's field is left alone
+    repeated = monte_carlo.temperature_scan(ham, [2.0, 2.0], mus=(.5,), nsweep=100, nburn=10)
+    assert(repeated["E"][0] != repeated["E"][1])
+    assert(ham.mu is mu)
+
+    # every task has its own seeded stream, so a process pool gives the same table
+    pooled = monte_carlo.temperature_scan(ham, Ts, mus=(.1, .5), seeds=(0, 1), nsweep=1000, nburn=100,
+                                          method="checkerboard", n_workers=2)
+    for name in ("T", "mu", "seed", "E", "M", "HC", "MS"):
+        assert(np.array_equal(table[name], pooled[name]))
+
+def test_shared_memory_hamiltonian():
+    G = build_random_graph(40, 120, seed=2)
+    ham = get_IsingHamiltonian(G, mus=list(np.linspace(-.5, .5, 40)))
+    conf = monte_carlo.BitString(N=40)
+    conf.initialize(M=17, rng=3)
+
+    with ham.to_shared_memory() as handle:
+        # the handle and the Hamiltonian built on it pickle as the block name and layout only
+        attached = pickle.loads(pickle.dumps(monte_carlo.IsingHamiltonian.from_shared_memory(handle)))
+        assert(len(pickle.dumps(attached)) < 1000)
+        assert(np.isclose(attached.energy(conf), ham.energy(conf)))
+        assert(not attached.data.flags.writeable)
+        with pytest.raises(ValueError):
+            attached.mu[0] = 1.0
+
+        table = monte_carlo.temperature_scan(ham, [1.0, 2.0], nsweep=50, nburn=10, n_workers=2, shared_memory=True)
+        serial = monte_carlo.temperature_scan(ham, [1.0, 2.0], nsweep=50, nburn=10)
+        assert(np.array_equal(table["E"], serial["E"]))
+
+def test_save_load(tmp_path, monkeypatch):
+    G = build_random_graph(30, 80, seed=4)
+    ham = get_IsingHamiltonian(G, mus=list(np.linspace(-.5, .5, 30)))
+    ham = monte_carlo.IsingHamiltonian(J=[row + [(i, .25)] for i, row in enumerate(ham.J)], mu=ham.mu)
+    conf = monte_carlo.BitString(N=30)
+    conf.initialize(M=11, rng=2)
+
+    ham.save(tmp_path / "ham.bin")
+    for mmap in (True, False):
+        loaded = monte_carlo.IsingHamiltonian.load(tmp_path / "ham.bin", mmap=mmap)
+        assert(isinstance(loaded.indices, np.memmap) == mmap)
+        assert(np.isclose(loaded.energy(conf), ham.energy(conf)))
+        assert(all(np.array_equal(getattr(loaded, name), getattr(ham, name))
+                   for name in ("indptr", "indices", "data", "mu")))
+    # a mapped Hamiltonian pickles as its absolute path, which works from any working directory
+    assert(len(pickle.dumps(loaded)) > len(pickle.dumps(monte_carlo.IsingHamiltonian.load(tmp_path / "ham.bin"))))
+    monkeypatch.chdir(tmp_path)
+    pickled = pickle.dumps(monte_carlo.IsingHamiltonian.load("ham.bin"))
+    monkeypatch.chdir(tmp_path.parent)
+    assert(np.isclose(pickle.loads(pickled).energy(conf), ham.energy(conf)))
+
+    # a model without couplings, and a file of another kind
+    empty = monte_carlo.IsingHamiltonian.from_edge_list([], mu=[.5, -.5])
+    empty.save(tmp_path / "empty.bin")
+    assert(np.isclose(monte_carlo.IsingHamiltonian.load(tmp_path / "empty.bin").energy(monte_carlo.BitString(N=2)), 0.0))
+    (tmp_path / "other.bin").write_bytes(b"not a model")
+    with pytest.raises(ValueError):
+        monte_carlo.IsingHamiltonian.load(tmp_path / "other.bin")
+
+def test_transfer_matrix():
+    # the ring of test_ising
+    N = 8
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    assert(ham.strip_width() == 1)
+    E, M, HC, MS = ham.compute_average_values(monte_carlo.BitString(N=N), 2, method="transfer")
+    assert(np.isclose(E, -3.73231850))
+    assert(np.isclose(M, -0.14658168))
+    assert(np.isclose(HC, 1.64589165))
+    assert(np.isclose(MS, 1.46663062))
+
+    # ladders and strips, open and periodic, with fields and a self coupling, against enumeration
+    Ts = np.array([.5, 1.0, 2.5])
+    for shape, periodic in [((7, 2), False), ((6, 3), True)]:
+        lattice = monte_carlo.hypercubic_lattice(shape, J=-1.0, mu=np.linspace(-.3, .3, np.prod(shape)),
+                                                 periodic=periodic)
+        ham = monte_carlo.IsingHamiltonian(J=[row + [(i, .3)] * (i == 0) for i, row in enumerate(lattice.J)],
+                                           mu=lattice.mu)
+        assert(ham.strip_width() == shape[1])
+        exact = [ham.compute_average_values(monte_carlo.BitString(N=ham.N), T) for T in Ts]
+        assert(np.allclose(np.transpose(ham.compute_average_values_over(Ts, method="transfer")), exact))
+
+    # a long ferromagnetic ring against its closed form Z = (2 cosh K)^N + (2 sinh K)^N
+    N = 2000
+    ring = monte_carlo.hypercubic_lattice(N, J=-1.0)
+    ham = monte_carlo.IsingHamiltonian(J=ring.J, mu=ring.mu)
+    log_z, E, M, HC, MS = ham.transfer_matrix_solve(Ts)
+    K = 1 / Ts
+    r = np.tanh(K)**N
+    assert(np.allclose(log_z, N * np.log(2 * np.cosh(K)) + np.log1p(r)))
+    assert(np.allclose(E, -N * (np.tanh(K) + r / np.tanh(K)) / (1 + r)))
+    assert(np.allclose(M, 0.0))
+
+    G = nx.complete_graph(12)
+    nx.set_edge_attributes(G, 1.0, 'weight')
+    with pytest.raises(ValueError):
+        get_IsingHamiltonian(G).transfer_matrix_solve(Ts, max_width=3)
+
+def test_acceptance_table(monkeypatch):
+    N = 8
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    assert(np.allclose(ham.delta_e_values(), [-4.2, -3.8, -.2, .2, 3.8, 4.2]))
+    table = ham.acceptance_table(2)
+    scale = monte_carlo.acceptance.TABLE_SCALE
+    assert(sorted(table) == [round(dE * scale) for dE in ham.delta_e_values()[3:].tolist()])
+    assert(np.isclose(table[round(4.2 * scale)], np.exp(-2.1)))
+    assert(ham.acceptance_table(2.0) is table)
+
+    # tables are kept for the most recently used temperatures only
+    for T in np.linspace(3, 5, monte_carlo.acceptance.ACCEPTANCE_CACHE_SIZE):
+        ham.acceptance_table(T)
+    assert(ham.acceptance_table(2) is not table)
+
+    # the lookups leave seeded trajectories unchanged
+    conf = monte_carlo.BitString(N=N)
+    conf.initialize(M=4, rng=1)
+    reference = cp.deepcopy(conf)
+    random.seed(2)
+    for _ in range(50):
+        ham.metropolis_sweep(conf, T=1.5)
+    ham_direct = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    monkeypatch.setattr(ham_direct, "acceptance_table", lambda T: None)
+    random.seed(2)
+    for _ in range(50):
+        ham_direct.metropolis_sweep(reference, T=1.5)
+    assert(all(conf.config == reference.config))
+
+    # changing mu in place rebuilds the values
+    ham.mu[:] = .3
+    assert(np.allclose(ham.delta_e_values(), [-4.6, -3.4, -.6, .6, 3.4, 4.6]))
+
+    # energy changes summed in another order than the table's still find their entry
+    lattice = monte_carlo.lattices.triangular_lattice(6, 6, J=.7, mu=.15, periodic=False)
+    table = lattice.acceptance_table(1.0)
+    for state in range(0, 2**36, 2**36 // 40 + 12345):
+        conf = monte_carlo.BitString(N=lattice.N)
+        conf.set_int_config(state)
+        for i in range(lattice.N):
+            delta_e = lattice.delta_e_for_flip(i, conf.config)
+            assert(delta_e <= 0 or round(float(delta_e) * scale) in table)
+
+    # continuous couplings fall back to evaluating the exponential
+    G = build_random_graph(24, 60, seed=3)
+    assert(get_IsingHamiltonian(G).acceptance_table(2.0) is None)
+
+def test_local_fields(tmp_path):
+    N = 30
+    G = build_random_graph(N, 200, seed=4)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    conf = monte_carlo.BitString(N=N)
+    conf.initialize(M=15, rng=1)
+
+    # the fields are updated with every accepted flip, and marked stale by sweeps that do not maintain them
+    state = monte_carlo.SamplerState(ham, conf, local_fields=True)
+    rng = np.random.default_rng(0)
+    for method in ("sequential", "checkerboard", "sequential"):
+        for _ in range(20):
+            ham.metropolis_sweep(conf, T=1.0, method=method, rng=rng, state=state)
+        assert(np.allclose(state.fields(), ham.local_fields(2.0 * conf.config - 1.0)))
+        assert(np.isclose(state.E, ham.energy(conf)))
+    assert(monte_carlo.SamplerState(ham, conf).fields() is None)
+
+    # with integer couplings the energy changes are exact, so seeded runs are unchanged
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    random.seed(2)
+    reference = monte_carlo.metropolis_monte_carlo(ham, cp.deepcopy(conf), T=1.5, nsweep=200, nburn=20)
+    random.seed(2)
+    tracked = monte_carlo.metropolis_monte_carlo(ham, cp.deepcopy(conf), T=1.5, nsweep=200, nburn=20,
+                                                 local_fields=True, checkpoint=tmp_path / "run.npz",
+                                                 checkpoint_interval=150)
+    assert(all(np.allclose(r, t) for r, t in zip(reference, tracked)))
+    assert(monte_carlo.load_checkpoint(tmp_path / "run.npz")["fields"].shape == (N,))
+
+def test_dense_hamiltonian(tmp_path):
+    N = 10
+    rng = np.random.default_rng(0)
+    G = nx.complete_graph(N)
+    for e in G.edges:
+        G.edges[e]['weight'] = rng.choice([-1.0, 1.0])
+    sparse = get_IsingHamiltonian(G, mus=[.1 * (i % 3) for i in range(N)])
+    dense = monte_carlo.DenseIsingHamiltonian.from_hamiltonian(sparse)
+    single = monte_carlo.DenseIsingHamiltonian(dense.matrix, dense.mu, dtype=np.float32)
+    assert(single.matrix.dtype == np.float32 and single.matrix.flags.c_contiguous)
+
+    conf = monte_carlo.BitString(N=N)
+    conf.initialize(M=5, rng=1)
+    assert(np.isclose(dense.energy(conf), sparse.energy(conf)))
+    assert(np.isclose(single.energy(conf), sparse.energy(conf)))
+    assert(np.isclose(dense.delta_e_for_flip(3, conf), sparse.delta_e_for_flip(3, conf)))
+    assert(np.isclose(dense.delta_e_for_flip(3, conf.config), sparse.delta_e_for_flip(3, conf)))
+    spins = 2.0 * rng.integers(0, 2, size=(20, N)) - 1.0
+    assert(np.allclose(dense._spin_energies(spins), sparse._spin_energies(spins)))
+    assert(np.allclose(dense.compute_average_values(conf, 2.0), sparse.compute_average_values(conf, 2.0)))
+    assert(all(np.array_equal(a, b) for a, b in zip(dense.nodes, sparse.nodes)))
+
+    # the local-field sweep draws the same random numbers and accepts the same flips
+    for T in (1.0, 4.0):
+        a, b = cp.deepcopy(conf), cp.deepcopy(conf)
+        random.seed(2)
+        sparse_results = monte_carlo.metropolis_monte_carlo(sparse, a, T=T, nsweep=200, nburn=10)
+        random.seed(2)
+        dense_results = monte_carlo.metropolis_monte_carlo(dense, b, T=T, nsweep=200, nburn=10)
+        assert(all(a.config == b.config))
+        assert(all(np.allclose(x, y) for x, y in zip(sparse_results, dense_results)))
+
+    # the neighbor-list methods work on the CSR arrays, built on demand
+    for method in ("checkerboard", "wolff"):
+        monte_carlo.metropolis_monte_carlo(dense, cp.deepcopy(conf), T=2.0, nsweep=20, nburn=5, method=method, rng=0)
+    assert(pickle.loads(pickle.dumps(dense)).energy(conf) == dense.energy(conf))
+
+    # saved and shared Hamiltonians come back dense, in the requested type, and pickle by reference
+    dense.save(tmp_path / "dense.bin")
+    loaded = monte_carlo.DenseIsingHamiltonian.load(tmp_path / "dense.bin", dtype=np.float32)
+    assert(loaded.matrix.dtype == np.float32 and np.allclose(loaded.matrix, dense.matrix))
+    assert(np.isclose(loaded.energy(conf), dense.energy(conf)))
+    unpickled = pickle.loads(pickle.dumps(loaded))
+    assert(unpickled.matrix.dtype == np.float32 and np.isclose(unpickled.energy(conf), dense.energy(conf)))
+    with dense.to_shared_memory() as handle:
+        shared = monte_carlo.DenseIsingHamiltonian.from_shared_memory(handle)
+        assert(np.array_equal(shared.matrix, dense.matrix) and np.isclose(shared.energy(conf), dense.energy(conf)))
+        assert(np.isclose(pickle.loads(pickle.dumps(shared)).energy(conf), dense.energy(conf)))
+        del shared
+
+    with pytest.raises(ValueError):
+        monte_carlo.DenseIsingHamiltonian(np.triu(np.ones((3, 3))))
+
+def test_energy_batch():
+    N = 9
+    G = build_1d_graph(N, 1)
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    rng = np.random.default_rng(0)
+    configs = rng.integers(0, 2, size=(50, N), dtype=np.uint8)
+    energies = []
+    for config in configs:
+        conf = monte_carlo.BitString(N=N)
+        conf.set_config(config)
+        energies.append(ham.energy(conf))
+
+    # any integer type, 0/1 or -1/+1, in any number of chunks
+    for spins in (configs, configs.astype(bool), 2 * configs.astype(np.int8) - 1, configs.astype(np.int64)):
+        assert(np.allclose(ham.energy_batch(spins), energies))
+        assert(np.allclose(ham.energy_batch(spins, chunk_size=7), energies))
+        assert(np.allclose(ham.magnetization_batch(spins, chunk_size=7), 2 * configs.sum(axis=1, dtype=int) - N))
+    assert(np.isclose(ham.energy_batch(configs[3]), energies[3]))
+
+    dense = monte_carlo.DenseIsingHamiltonian.from_hamiltonian(ham)
+    lattice = monte_carlo.hypercubic_lattice(N, J=1.0, mu=.1)
+    assert(np.allclose(dense.energy_batch(configs, chunk_size=7), energies))
+    assert(np.allclose(lattice.energy_batch(configs), ham.energy_batch(configs)))
+
+    # the bond lists built for batches are not pickled
+    ham = get_IsingHamiltonian(G, mus=[.1 for i in range(N)])
+    size = len(pickle.dumps(ham))
+    ham.energy_batch(configs)
+    assert(len(pickle.dumps(ham)) == size)
+
+    with pytest.raises(ValueError):
+        ham.energy_batch(2 * configs)
+    with pytest.raises(ValueError):
+        ham.energy_batch(configs[:, 1:])
+
 if __name__== "__main__":
     test_monte_carlo_imported()
     test_ising()
@@ -268,4 +1004,11 @@ if __name__== "__main__":
     test_average_values()
     test_metropolis()
     test_delta_e()
-
+    test_csr_couplings()
+    test_enumeration_chunks()
+    test_density_of_states()
+    test_streaming_accumulators()
+    test_blocking_analysis()
+    test_rng_streams()
+    test_transfer_matrix()
+    test_energy_batch()
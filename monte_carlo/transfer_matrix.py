@@ -0,0 +1,98 @@
+import numpy as np
+
+from .enumeration import _states_to_spins
+
+
+def _bonds(ham):
+    """
+    Returns every coupling once, as arrays (i, j, J) with i < j.
+    """
+    rows = np.repeat(np.arange(ham.N), np.diff(ham.indptr))
+    upper = rows < ham.indices
+    return rows[upper], np.asarray(ham.indices[upper], dtype=np.int64), np.asarray(ham.data[upper])
+
+
+def _strip_width(ham, max_width=8):
+    """
+    Returns the smallest width w, dividing N, such that the sites cut into consecutive slices of w are only
+    coupled within a slice or to the neighboring slices (periodically), or None if no w <= max_width works.
+    """
+    i, j, _ = _bonds(ham)
+    for w in range(1, min(max_width, ham.N) + 1):
+        if ham.N % w:
+            continue
+        n_slices = ham.N // w
+        gap = j // w - i // w
+        if np.all((gap <= 1) | (gap == n_slices - 1)):
+            return w
+    return None
+
+
+def _ring_product(A, B):
+    """
+    Multiplies two matrices over the ring of polynomials in (a, b) truncated to the terms 1, a, b, a^2, b^2.
+
+    The coefficients are stacked along axis -3 in that order, so that a product of the transfer matrices
+    carries the sums of exp(a E + b M) Boltzmann weights to second order in a and b.
+    """
+    C = np.empty(np.broadcast_shapes(A.shape, B.shape))
+    C[..., 0, :, :] = A[..., 0, :, :] @ B[..., 0, :, :]
+    C[..., 1, :, :] = A[..., 1, :, :] @ B[..., 0, :, :] + A[..., 0, :, :] @ B[..., 1, :, :]
+    C[..., 2, :, :] = A[..., 2, :, :] @ B[..., 0, :, :] + A[..., 0, :, :] @ B[..., 2, :, :]
+    C[..., 3, :, :] = (A[..., 3, :, :] @ B[..., 0, :, :] + A[..., 1, :, :] @ B[..., 1, :, :]
+                       + A[..., 0, :, :] @ B[..., 3, :, :])
+    C[..., 4, :, :] = (A[..., 4, :, :] @ B[..., 0, :, :] + A[..., 2, :, :] @ B[..., 2, :, :]
+                       + A[..., 0, :, :] @ B[..., 4, :, :])
+    return C
+
+
+def _transfer_matrix_solve(ham, Ts, w):
+    """
+    Computes log Z and the averages of E, M, E^2 and M^2 at the temperatures Ts by transfer matrices.
+
+    Slice k (sites k*w .. k*w+w-1) contributes the matrix T_k(s, s') = exp(-beta e_k(s, s')) between its
+    state s and the state s' of slice k+1, where e_k holds the bonds within slice k, its fields and its bonds
+    to slice k+1. Every configuration is one term of Tr(T_0 T_1 ... T_L-1), also for open chains, whose last
+    matrix does not depend on s'. The entries are polynomials in (a, b) standing for exp(a e_k + b m_k), so
+    the trace also gives the first and second moments of E and M.
+    """
+    Ts = np.asarray(Ts, dtype=float)
+    beta = 1.0 / Ts.reshape(-1, 1, 1)
+    n_slices = ham.N // w
+    spins = _states_to_spins(np.arange(2**w, dtype=np.int64), w)
+    m = spins.sum(axis=1)[:, None]
+    mu = np.broadcast_to(ham.mu, (ham.N,))
+
+    i, j, J = _bonds(ham)
+    slice_i, slice_j = i // w, j // w
+    # bonds within a slice, and bonds from slice k to k+1 (the wrap-around bonds go from the last slice to 0)
+    within = slice_i == slice_j
+    forward = slice_j == slice_i + 1
+    wrap = ~within & ~forward
+
+    product = None
+    log_scale = np.zeros(len(Ts))
+    for k in range(n_slices):
+        sites = slice(k * w, (k + 1) * w)
+        energy = spins @ mu[sites] + (ham._diag_sum if k == 0 else 0.0)
+        bonds = within & (slice_i == k)
+        energy = energy + (spins[:, i[bonds] % w] * spins[:, j[bonds] % w]) @ J[bonds]
+        energy = np.repeat(energy[:, None], 2**w, axis=1)
+        bonds = forward & (slice_i == k)
+        energy = energy + (spins[:, i[bonds] % w] * J[bonds]) @ spins[:, j[bonds] % w].T
+        if k == n_slices - 1:
+            # the wrap-around bonds go from site j of this slice to site i of slice 0
+            bonds = wrap
+            energy = energy + (spins[:, j[bonds] % w] * J[bonds]) @ spins[:, i[bonds] % w].T
+
+        weight = np.exp(-beta * (energy - energy.min()))
+        matrix = np.stack((weight, weight * energy, weight * m, weight * energy**2 / 2, weight * m**2 / 2), axis=1)
+        log_scale += -beta[:, 0, 0] * energy.min()
+        product = matrix if product is None else _ring_product(product, matrix)
+        # keep the entries in range; the common factor drops out of every average
+        scale = product[:, 0].max(axis=(1, 2))
+        product /= scale[:, None, None, None]
+        log_scale += np.log(scale)
+
+    Z, E, M, EE, MM = np.trace(product, axis1=2, axis2=3).T
+    return log_scale + np.log(Z), E / Z, M / Z, 2 * EE / Z, 2 * MM / Z